@@ -1,34 +1,27 @@
 #geodiscovery.streamlit.app 
 
+import os
+
 import streamlit as st
-import pandas as pd
-import requests
-from geopy.geocoders import Nominatim
-from math import radians, sin, cos, sqrt, atan2
-from sklearn.preprocessing import StandardScaler
-from streamlit_folium import folium_static
-import folium
 
-# ------------------------------
-# Utility: Haversine Distance
-# ------------------------------
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # Earth's radius in km
-    d_lat = radians(lat2 - lat1)
-    d_lon = radians(lon2 - lon1)
-    a = sin(d_lat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon/2)**2
-    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+from geodiscovery.fsq_cache import get_cache
+from geodiscovery.amenities import MODES
+from geodiscovery.clustering import CITY_SAMPLE, city_model
+from geodiscovery.map_render import build_map
+from geodiscovery.recommender import CITY_COSTS, METRO_RADIUS, Pipeline, fetch_residences, score_locations
+from geodiscovery.snapshot import get_replay
+from geodiscovery.taxonomy import load_taxonomy
+from geodiscovery.tracing import Trace, prometheus_text, stage
+from geodiscovery.warmer import WARMER_ENABLED, start_warmer
 
 # ------------------------------
 # Static Cost Data (Mocked)
 # ------------------------------
-mock_city_costs = {
-    "":0, "Delhi": 40000, "Mumbai": 45000, "Bangalore": 42000, "Hyderabad": 37000,
-    "Ahmedabad": 35000, "Chennai": 39000, "Kolkata": 36000, "Pune": 38000,
-    "Jaipur": 32000, "Lucknow": 31000, "Kanpur": 30000, "Nagpur": 32000,
-    "Indore": 31000, "Thane": 35000, "Bhopal": 30000, "Visakhapatnam": 33000,
-    "Patna": 29000, "Vadodara": 31000, "Ghaziabad": 34000, "Ludhiana": 30000
-}
+mock_city_costs = {"": 0, **CITY_COSTS}
+
+# Optional background cache warmer for popular lookups (GEODISCOVERY_WARMER=1); one thread per process
+if WARMER_ENABLED:
+    start_warmer()
 
 # ------------------------------
 # Streamlit UI Setup
@@ -36,10 +29,8 @@ mock_city_costs = {
 st.set_page_config(page_title="Relocation Recommendation System", layout="centered")
 st.title("🏙️ Relocation Recommendation System")
 
-# Load Amenity Category Data
-df = pd.read_csv("personalization-apis-movement-sdk-categories.csv")
-df[['Super Category', 'Sub Category']] = df['Category Label'].str.split(' > ', n=1, expand=True)
-df.dropna(subset=['Super Category', 'Sub Category'], inplace=True)
+# Load Amenity Category Data (parsed once per process, cold start reads a binary snapshot)
+taxonomy = load_taxonomy()
 
 # City Input
 major_cities = list(mock_city_costs.keys())
@@ -73,119 +64,115 @@ food_prefs = {
 
 # Amenity Preferences
 st.markdown("### 🏋️ Amenity Preferences")
-super_categories = sorted(df['Super Category'].unique())
+super_categories = taxonomy.super_categories
 selected_supers = st.multiselect("Select Super Categories", super_categories)
 
 selected_subs, selected_category_ids = [], []
 if selected_supers:
-    filtered_subs = df[df['Super Category'].isin(selected_supers)]['Sub Category'].unique()
-    selected_subs = st.multiselect("Now select specific amenities:", sorted(filtered_subs))
-    selected_category_ids = df[df['Sub Category'].isin(selected_subs)]['Category ID'].unique().tolist()
+    filtered_subs = taxonomy.subcategories(selected_supers)
+    selected_subs = st.multiselect("Now select specific amenities:", filtered_subs)
+    selected_category_ids = taxonomy.category_ids(selected_subs)
     if not selected_category_ids:
         st.warning("⚠️ Please select at least one amenity.")
 else:
     st.info("ℹ️ Start by selecting one or more super categories.")
 
+with st.expander("⚙️ Advanced"):
+    metro_wide = st.checkbox("Metro-wide search (pages through hundreds of residences, keeps the best 10)")
+    # A per-residence lookup would cost one call per discovered residence and category, so a
+    # metro-wide search always looks amenities up once for the whole area
+    amenity_mode = st.radio(
+        "Amenity lookup", [m for m in MODES if not (metro_wide and m == "per_residence")],
+        format_func=lambda m: {"per_residence": "Nearest per residence", "harvest": "City-wide harvest (fewer API calls)",
+                   "grid": "Prebuilt density grid (no API calls)"}[m]
+    )
+
 # ---------------------------------
 # ✅ Submit Button Logic
 # ---------------------------------
-if st.button("Submit Preferences", key="submit_button_final"):
-    geolocator = Nominatim(user_agent="relocation-system")
-    loc = geolocator.geocode(city)
-    if not loc:
-        st.error("City not found.")
-        st.stop()
+# Stages are cached per session: geocode(city) → residences(city) → amenity distances(residences,
+# categories) → scores(prefs). Submit refreshes whatever changed upstream; after that, income and
+# food changes re-rank on every rerun without any network I/O.
+if "pipeline" not in st.session_state:
+    st.session_state.pipeline = Pipeline()
+pipeline = st.session_state.pipeline
 
-    lat, lon = loc.latitude, loc.longitude
+if st.button("Submit Preferences", key="submit_button_final"):
+    with Trace("submit") as submit_trace:
+        st.session_state.submit_trace = submit_trace
+        st.session_state.submitted = False
+        if pipeline.geocode(city) is None:
+            st.error("City not found.")
+            st.stop()
+
+        if metro_wide:
+            # Candidates are scored page by page and only the running top 10 is kept, shown as it improves
+            preview, found = st.empty(), False
+            for residences, avg in pipeline.stream(city, selected_category_ids, mode=amenity_mode,
+                                                   metro_radius=METRO_RADIUS):
+                found = True
+                ranked = score_locations(residences, avg, numeric_income, mock_city_costs.get(city, 30000), food_prefs)
+                preview.dataframe(ranked[["Name", "Address", "Final Score"]], hide_index=True)
+            preview.empty()
+            if not found:
+                st.warning("No residential areas found.")
+                st.stop()
+        else:
+            residences = pipeline.residences(city)
+            if residences.empty:
+                st.warning("No residential areas found.")
+                st.stop()
+
+            # Calculate Average Distance to Amenities (residence × category matrix fetched in parallel)
+            pipeline.distances(city, selected_category_ids, mode=amenity_mode)
+        st.session_state.submitted = True
+
+if st.session_state.get("submitted"):
+    city = pipeline.city
+    lat, lon = pipeline.geocode(city)
     cost = mock_city_costs.get(city, 30000)
     st.write(f"📍 Coordinates of {city}: ({lat}, {lon})")
     st.write(f"💰 Estimated Living Cost: ₹{cost:,.0f}")
 
-    # Fetch Residential Areas Nearby
-    fsq_api = "fsq3boHgIjG5qvz5vBtpvE8ns4qAo4lrrPFLBf+tlbn+dr8="
-    headers = {"Accept": "application/json", "Authorization": fsq_api}
-    res_url = "https://api.foursquare.com/v3/places/search"
-    res_params = {
-        "ll": f"{lat},{lon}",
-        "radius": 5000,
-        "categories": "4f2a25ac4b909258e854f55f,4e67e38e036454776db1fb3a,4d954b06a243a5684965b473",
-        "limit": 20
-    }
-    res_response = requests.get(res_url, params=res_params, headers=headers).json()
-    results = res_response.get("results", [])
-
-    if not results:
-        st.warning("No residential areas found.")
-        st.stop()
-
-    # Prepare Residential DataFrame
-    df_locations = pd.DataFrame([{
-        "Name": r.get("name", "N/A"),
-        "Address": r.get("location", {}).get("formatted_address", "N/A"),
-        "Latitude": r["geocodes"]["main"]["latitude"],
-        "Longitude": r["geocodes"]["main"]["longitude"]
-    } for r in results])
-
-    # Calculate Average Distance to Amenities
-    def avg_dist(lat, lon, categories):
-        dists = []
-        for cid in categories:
-            resp = requests.get(res_url, params={"ll": f"{lat},{lon}", "radius": 5000, "categories": cid, "limit": 1}, headers=headers).json()
-            r = resp.get("results", [])
-            if r:
-                g = r[0]["geocodes"]["main"]
-                dists.append(haversine(lat, lon, g["latitude"], g["longitude"]))
-        return sum(dists) / len(dists) if dists else 9999
-
-    df_locations["Avg Amenity Distance"] = df_locations.apply(lambda x: avg_dist(x["Latitude"], x["Longitude"], selected_category_ids), axis=1)
-
-    # Add Food & Income Preferences
-    for pref, val in food_prefs.items():
-        df_locations[pref] = val
-    df_locations["Income"] = numeric_income
-    df_locations["Estimated City Cost"] = cost
-
-    # Score Calculations
-    df_locations["Proximity Score"] = 1 / df_locations["Avg Amenity Distance"]
-    df_locations["Proximity Score"] /= df_locations["Proximity Score"].max()
-
-    df_locations["Affordability Score"] = df_locations["Income"] / df_locations["Estimated City Cost"]
-    df_locations["Affordability Score"] = df_locations["Affordability Score"].apply(lambda x: min(x, 1.5))
-
-    food_cols = list(food_prefs.keys())
-    df_locations["Food Score"] = df_locations[food_cols].sum(axis=1)
-    df_locations["Food Score"] /= df_locations["Food Score"].max()
-
-    # Final Score
-    df_locations["Final Score"] = (
-        0.5 * df_locations["Proximity Score"] +
-        0.3 * df_locations["Affordability Score"] +
-        0.2 * df_locations["Food Score"]
-    )
-
-    # Sort and limit top 10 recommendations
-    df_locations = df_locations.sort_values("Final Score", ascending=False).head(10)
-
-    # 🗺️ Map Visualization
-    st.markdown("### 📌 Recommended Residential Clusters")
-    map_center = [df_locations['Latitude'].mean(), df_locations['Longitude'].mean()]
-    recommendation_map = folium.Map(location=map_center, zoom_start=13)
-
-    for _, row in df_locations.iterrows():
-        popup_text = f"""
-        🏠 <b>{row['Name']}</b><br>
-        📍 {row['Address']}<br>
-        💸 Income: ₹{numeric_income:,}<br>
-        📉 City Cost: ₹{int(cost):,}<br>
-        ✅ Match Score: {round(row['Final Score'], 2)}
-        """
-        folium.Marker(
-            location=[row['Latitude'], row['Longitude']],
-            popup=folium.Popup(popup_text, max_width=300),
-            icon=folium.Icon(color="blue", icon="home", prefix="fa")
-        ).add_to(recommendation_map)
-
-    folium_static(recommendation_map)
+    with Trace("rank") as rank_trace:
+        # Score, sort and limit top 10 recommendations
+        scored = pipeline.scores(numeric_income, food_prefs)
+        df_locations = scored.head(10).copy()
+
+        # Each city is clustered once, on a fixed sample around its center (persisted per city);
+        # whatever residences this Submit found are only assigned to the nearest centroid
+        with stage("clusters"):
+            def city_sample():
+                sample = fetch_residences(lat, lon, limit=CITY_SAMPLE)
+                return (scored if sample.empty else sample)[["Latitude", "Longitude"]].to_numpy()
+
+            cluster_model = city_model(city, city_sample)
+            df_locations["Cluster"] = cluster_model.assign(df_locations[["Latitude", "Longitude"]].to_numpy())
+
+        with stage("render"):
+            # 🗺️ Map Visualization
+            st.markdown("### 📌 Recommended Residential Clusters")
+            # One Marker per row for small result sets, a single clustered layer above the threshold
+            recommendation_map = build_map(df_locations, numeric_income, cost)
+
+            # folium is only imported once there is a map to show, keeping cold starts light
+            from streamlit_folium import folium_static
+            folium_static(recommendation_map)
+
+    cache = get_cache()
+    replay = get_replay()
+    if replay is not None:
+        st.caption(f"Offline replay of snapshot {os.path.basename(replay.path)}")
+    elif cache is not None:
+        stats = cache.stats()
+        st.caption(f"Foursquare cache: {stats['hits']} hits / {stats['misses']} misses")
+
+    # 🩺 Per-stage timing, HTTP calls and cache activity
+    with st.expander("🩺 Diagnostics"):
+        traces = [t for t in (st.session_state.get("submit_trace"), rank_trace) if t is not None]
+        st.dataframe([dict(rec, trace=t.name) for t in traces for rec in t.stages])
+        st.download_button("Prometheus metrics", prometheus_text(), file_name="geodiscovery.prom", mime="text/plain")
+        st.download_button("JSON trace", "\n".join(t.to_json() for t in traces), file_name="geodiscovery_trace.jsonl", mime="application/json")
 
     # ⬇️ CSV Download Option
     st.markdown("### 📄 Download Recommendations")
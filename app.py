@@ -1,47 +1,15 @@
 import streamlit as st
-import pandas as pd
-import requests
-from geopy.geocoders import Nominatim
-from math import radians, sin, cos, sqrt, atan2
-from sklearn.preprocessing import StandardScaler
-from streamlit_folium import folium_static
-import folium
 
-# --------------------------
-# Utility: Haversine formula
-# --------------------------
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # km
-    d_lat = radians(lat2 - lat1)
-    d_lon = radians(lon2 - lon1)
-    a = sin(d_lat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon/2)**2
-    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+from geodiscovery.fsq_cache import get_cache
+from geodiscovery.amenities import MODES
+from geodiscovery.map_render import build_map
+from geodiscovery.recommender import CITY_COSTS, Pipeline
+from geodiscovery.taxonomy import load_taxonomy
 
 # ----------------------------
 # City-wise mocked cost lookup
 # ----------------------------
-mock_city_costs = {
-    "Delhi": 40000,
-    "Mumbai": 45000,
-    "Bangalore": 42000,
-    "Hyderabad": 37000,
-    "Ahmedabad": 35000,
-    "Chennai": 39000,
-    "Kolkata": 36000,
-    "Pune": 38000,
-    "Jaipur": 32000,
-    "Lucknow": 31000,
-    "Kanpur": 30000,
-    "Nagpur": 32000,
-    "Indore": 31000,
-    "Thane": 35000,
-    "Bhopal": 30000,
-    "Visakhapatnam": 33000,
-    "Patna": 29000,
-    "Vadodara": 31000,
-    "Ghaziabad": 34000,
-    "Ludhiana": 30000
-}
+mock_city_costs = dict(CITY_COSTS)
 
 # --------------------------
 # UI Setup
@@ -49,10 +17,8 @@ mock_city_costs = {
 st.set_page_config(page_title="Relocation Recommendation System", layout="centered")
 st.title("🏙️ Relocation Recommendation System")
 
-# Load Foursquare categories
-df = pd.read_csv("personalization-apis-movement-sdk-categories.csv")
-df[['Super Category', 'Sub Category']] = df['Category Label'].str.split(' > ', n=1, expand=True)
-df.dropna(subset=['Super Category', 'Sub Category'], inplace=True)
+# Load Foursquare categories (parsed once per process, cold start reads a binary snapshot)
+taxonomy = load_taxonomy()
 
 # Cities
 major_cities = ["", "Mumbai", "Delhi", "Bangalore", "Hyderabad", "Ahmedabad", "Chennai", "Kolkata", "Pune", "Jaipur", "Lucknow", "Kanpur", "Nagpur", "Indore", "Thane", "Bhopal", "Visakhapatnam", "Patna", "Vadodara", "Ghaziabad", "Ludhiana"]
@@ -96,123 +62,71 @@ food_prefs = {
 
 # Amenity Preferences
 st.markdown("### 🏋️ Amenity Preferences")
-super_categories = sorted(df['Super Category'].unique())
+super_categories = taxonomy.super_categories
 selected_supers = st.multiselect("Super Categories", super_categories)
 
 selected_subs = []
 selected_category_ids = []
 if selected_supers:
-    filtered_subs = df[df['Super Category'].isin(selected_supers)]['Sub Category'].unique()
-    selected_subs = st.multiselect("Select specific amenities:", sorted(filtered_subs))
-    selected_category_ids = df[df['Sub Category'].isin(selected_subs)]['Category ID'].unique().tolist()
+    filtered_subs = taxonomy.subcategories(selected_supers)
+    selected_subs = st.multiselect("Select specific amenities:", filtered_subs)
+    selected_category_ids = taxonomy.category_ids(selected_subs)
+
+amenity_mode = st.radio("Amenity lookup", MODES, horizontal=True)
+
+# Column names used by this app for the engine's scored frame
+APP_COLUMNS = {
+    "Name": "name", "Address": "address", "Latitude": "lat", "Longitude": "lon",
+    "Avg Amenity Distance": "avg_amenity_distance", "Proximity Score": "proximity_score",
+    "Affordability Score": "affordability_score", "Food Score": "food_score",
+    "Final Score": "final_score"
+}
+
+# Cached pipeline stages: only the parts whose inputs changed are recomputed, and once
+# results exist, income/food changes re-rank without any network I/O.
+if "pipeline" not in st.session_state:
+    st.session_state.pipeline = Pipeline()
+pipeline = st.session_state.pipeline
 
 # Submit Button
 if st.button("Submit Preferences", key="submit_button"):
-    geolocator = Nominatim(user_agent="relocation-system")
-    loc = geolocator.geocode(city)
-    if not loc:
+    st.session_state.submitted = False
+    if pipeline.geocode(city) is None:
         st.error("City not found.")
         st.stop()
 
-    lat, lon = loc.latitude, loc.longitude
-    cost = mock_city_costs.get(city, 30000)
-    st.write(f"📍 Coordinates of {city}: ({lat}, {lon})")
-    st.write(f"💰 Estimated Living Cost: ₹{cost:,.0f}")
-
-    # Fetch Residential Areas
-    fsq_api = "fsq3boHgIjG5qvz5vBtpvE8ns4qAo4lrrPFLBf+tlbn+dr8="
-    headers = {"Accept": "application/json", "Authorization": fsq_api}
-    res_url = "https://api.foursquare.com/v3/places/search"
-    res_params = {
-        "ll": f"{lat},{lon}",
-        "radius": 5000,
-        "categories": "4f2a25ac4b909258e854f55f,4e67e38e036454776db1fb3a,4d954b06a243a5684965b473",
-        "limit": 15
-    }
-    res_response = requests.get(res_url, params=res_params, headers=headers).json()
-    results = res_response.get("results", [])
-
-    if not results:
+    if pipeline.residences(city, limit=15).empty:
         st.warning("No residential areas found.")
         st.stop()
 
-    locations = []
-    for i, r in enumerate(results):
-        locations.append({
-            "serial": i + 1,
-            "name": r.get("name", "N/A"),
-            "address": r.get("location", {}).get("formatted_address", "N/A"),
-            "lat": r["geocodes"]["main"]["latitude"],
-            "lon": r["geocodes"]["main"]["longitude"]
-        })
-
-    df_locations = pd.DataFrame(locations)
-
-    # Calculate avg distance to amenities
-    def average_distance(lat, lon, categories):
-        distances = []
-        for cid in categories:
-            amenity_resp = requests.get(res_url, params={
-                "ll": f"{lat},{lon}",
-                "radius": 5000,
-                "categories": cid,
-                "limit": 1
-            }, headers=headers).json()
-            results = amenity_resp.get("results", [])
-            if results:
-                a = results[0]["geocodes"]["main"]
-                dist = haversine(lat, lon, a["latitude"], a["longitude"])
-                distances.append(dist)
-        return sum(distances) / len(distances) if distances else 9999
-
-    df_locations["avg_amenity_distance"] = df_locations.apply(
-        lambda x: average_distance(x["lat"], x["lon"], selected_category_ids), axis=1
-    )
-
-    # Add preferences
-    for pref, val in food_prefs.items():
-        df_locations[pref] = val
-    df_locations["income"] = numeric_income
-    df_locations["estimated_cost"] = cost
-
-    # Scoring
-    df_locations["proximity_score"] = 1 / df_locations["avg_amenity_distance"]
-    df_locations["proximity_score"] /= df_locations["proximity_score"].max()
-
-    df_locations["affordability_score"] = df_locations["income"] / df_locations["estimated_cost"]
-    df_locations["affordability_score"] = df_locations["affordability_score"].apply(lambda x: min(x, 1.5))
+    # Calculate avg distance to amenities (all residence × category lookups run concurrently)
+    pipeline.distances(city, selected_category_ids, mode=amenity_mode, limit=15)
+    st.session_state.submitted = True
 
-    food_cols = list(food_prefs.keys())
-    df_locations["food_score"] = df_locations[food_cols].sum(axis=1)
-    df_locations["food_score"] /= df_locations["food_score"].max()
+if st.session_state.get("submitted"):
+    city = pipeline.city
+    lat, lon = pipeline.geocode(city)
+    cost = mock_city_costs.get(city, 30000)
+    st.write(f"📍 Coordinates of {city}: ({lat}, {lon})")
+    st.write(f"💰 Estimated Living Cost: ₹{cost:,.0f}")
 
-    df_locations["final_score"] = (
-        0.5 * df_locations["proximity_score"] +
-        0.3 * df_locations["affordability_score"] +
-        0.2 * df_locations["food_score"]
-    )
-    df_locations.sort_values("final_score", ascending=False, inplace=True)
+    # Scoring
+    df_locations = pipeline.scores(numeric_income, food_prefs).rename(columns=APP_COLUMNS)
+    df_locations.insert(0, "serial", df_locations.index + 1)
 
     # ✅ 8. Visualize
     st.markdown("### 🗺️ Recommended Residential Clusters")
-    map_center = [df_locations['lat'].mean(), df_locations['lon'].mean()]
-    recommendation_map = folium.Map(location=map_center, zoom_start=13)
-
-    for _, row in df_locations.iterrows():
-        popup_text = f"""
-        🏠 <b>{row['name']}</b><br>
-        📍 {row['address']}<br>
-        💸 Income: ₹{numeric_income:,}<br>
-        📉 City Cost: ₹{int(cost):,}<br>
-        ✅ Match Score: {round(row['final_score'], 2)}
-        """
-        folium.Marker(
-            location=[row['lat'], row['lon']],
-            popup=folium.Popup(popup_text, max_width=300),
-            icon=folium.Icon(color="blue", icon="home", prefix="fa")
-        ).add_to(recommendation_map)
+    recommendation_map = build_map(df_locations, numeric_income, cost, columns={
+        "name": "name", "address": "address", "lat": "lat", "lon": "lon", "score": "final_score"
+    })
 
+    # folium is only imported once there is a map to show, keeping cold starts light
+    from streamlit_folium import folium_static
     folium_static(recommendation_map)
+    cache = get_cache()
+    if cache is not None:
+        stats = cache.stats()
+        st.caption(f"Foursquare cache: {stats['hits']} hits / {stats['misses']} misses")
 
 
     # # ✅ 1. Geocode the City
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded lazily on first use; importing the engine must not pull these in
+HEAVY = ("sklearn", "folium", "streamlit", "streamlit_folium", "geopy", "requests", "joblib", "pyarrow")
+BASE = "numpy, pandas"   # imported eagerly by design; recent pandas pulls in pyarrow itself when installed
+
+
+def _loaded_heavy(module):
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return {m for m in proc.stdout.strip().split(",") if m}
+
+
+def _cold_import(module):
+    """Import ``module`` in a fresh interpreter; returns its cumulative ``-X importtime`` (µs)
+    and the heavy modules that ended up loaded."""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    cumulative = 0
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1])
+    return cumulative, [m for m in proc.stdout.strip().split(",") if m]
+
+
+# ------------------------------
+# Cold-start import cost of the engine (worker start-up, batch/CLI latency)
+# ------------------------------
+@pytest.mark.parametrize("module", [
+    "geodiscovery.fsq_client", "geodiscovery.scoring", "geodiscovery.recommender", "geodiscovery.batch",
+])
+def test_engine_import(benchmark, module):
+    cumulative, heavy = benchmark.pedantic(_cold_import, args=(module,), rounds=5, iterations=1)
+    benchmark.extra_info["import_us"] = cumulative
+    heavy = sorted(set(heavy) - _loaded_heavy(BASE))
+    assert not heavy, f"importing {module} loads {', '.join(heavy)} eagerly"
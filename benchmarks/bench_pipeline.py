@@ -0,0 +1,130 @@
+from math import pi, sqrt
+
+import numpy as np
+import pytest
+
+from geodiscovery.distance import distance_matrix, haversine, nearest
+from geodiscovery.fsq_client import PAGE_LIMIT
+from geodiscovery.recommender import FOOD_PREFERENCES, RESIDENTIAL_CATEGORIES, Pipeline, discover_residences
+from geodiscovery.scoring import score_matrix
+
+BANGALORE = (12.9716, 77.5946)
+FOOD = {f: 3 for f in FOOD_PREFERENCES}
+
+
+def _category_ids(n):
+    return [f"bench-cat-{i}" for i in range(n)]
+
+
+def _metro_radius(residences, spacing):
+    # Metres around the center holding about ``residences`` mock residences (one per category per cell)
+    per_m2 = len(RESIDENTIAL_CATEGORIES.split(",")) / spacing ** 2
+    return int(sqrt(residences / (per_m2 * pi)))
+
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        BANGALORE[0] + rng.uniform(-0.05, 0.05, n),
+        BANGALORE[1] + rng.uniform(-0.05, 0.05, n),
+    ])
+
+
+# ------------------------------
+# End-to-end Submit latency against the mock APIs
+# ------------------------------
+@pytest.mark.parametrize("categories", [1, 5])
+@pytest.mark.parametrize("residences", [20, 50])
+def test_submit_per_residence(benchmark, api_calls, residences, categories):
+    ids = _category_ids(categories)
+    benchmark.pedantic(
+        lambda: Pipeline().run("Bangalore", ids, 45000, FOOD, mode="per_residence", limit=residences),
+        rounds=3, iterations=1,
+    )
+
+
+@pytest.mark.parametrize("categories", [1, 5])
+@pytest.mark.parametrize("residences", [20, 1000, 10000])
+def test_submit_harvest(benchmark, api_calls, residences, categories):
+    ids = _category_ids(categories)
+    if residences <= PAGE_LIMIT:
+        def submit():
+            return Pipeline().run("Bangalore", ids, 45000, FOOD, mode="harvest", limit=residences)
+    else:
+        # One search returns at most PAGE_LIMIT places, so larger sets come from a metro-wide
+        # search (the app's Metro-wide option) sized to find about that many residences
+        metro_radius = _metro_radius(residences, api_calls.spacing)
+
+        def submit():
+            pipeline = Pipeline()
+            for _ in pipeline.stream("Bangalore", ids, mode="harvest", metro_radius=metro_radius):
+                pass
+            return pipeline.scores(45000, FOOD)
+    benchmark.pedantic(submit, rounds=3, iterations=1)
+
+
+# ------------------------------
+# Metro-wide discovery coverage against the mock's own places
+# ------------------------------
+@pytest.mark.parametrize("radius", [1000, 3000])
+def test_metro_coverage(benchmark, api_calls, radius):
+    from mock_server import synthetic_places
+
+    found = benchmark.pedantic(
+        lambda: [r for page in discover_residences(*BANGALORE, metro_radius=radius) for r in page],
+        rounds=1, iterations=1,
+    )
+    coords = np.array([(r["Latitude"], r["Longitude"]) for r in found]).reshape(-1, 2)
+    meters = haversine(*BANGALORE, coords[:, 0], coords[:, 1]) * 1000
+    assert len(found) == len({(r["Latitude"], r["Longitude"]) for r in found}), "duplicate residences"
+    assert (meters <= radius).all(), f"{(meters > radius).sum()} residences outside the metro radius"
+
+    # The mock measures distance on a flat earth; leave a margin for the engine's haversine
+    truth = {
+        (p["geocodes"]["main"]["latitude"], p["geocodes"]["main"]["longitude"])
+        for category in RESIDENTIAL_CATEGORIES.split(",")
+        for _, p in synthetic_places(*BANGALORE, radius - 20, category, api_calls.spacing)
+    }
+    missing = truth - {(r["Latitude"], r["Longitude"]) for r in found}
+    assert not missing, f"{len(missing)} of {len(truth)} residences missed"
+    benchmark.extra_info["residences"] = len(found)
+
+
+def test_geocode_uncached_city(benchmark, api_calls):
+    from geodiscovery import geocoding
+
+    def lookup():
+        geocoding._cache = {}
+        return geocoding.geocode("Benchmarkpur")
+
+    benchmark.pedantic(lookup, rounds=5, iterations=1)
+
+
+# ------------------------------
+# Distance kernel throughput
+# ------------------------------
+@pytest.mark.parametrize("method", ["haversine", "equirectangular"])
+@pytest.mark.parametrize("amenities", [1, 50, 1000])
+@pytest.mark.parametrize("residences", [20, 1000, 10000])
+def test_distance_matrix(benchmark, residences, amenities, method):
+    a, b = _points(residences, 1), _points(amenities, 2)
+    benchmark(distance_matrix, a, b, method=method, dtype=np.float32)
+
+
+@pytest.mark.parametrize("residences", [1000, 10000])
+def test_nearest_chunked(benchmark, residences):
+    a, b = _points(residences, 1), _points(5000, 2)
+    benchmark(nearest, a, b, max_bytes=8 * 1024 * 1024)
+
+
+# ------------------------------
+# Scoring throughput
+# ------------------------------
+@pytest.mark.parametrize("profiles", [1, 1000])
+@pytest.mark.parametrize("residences", [20, 1000, 10000])
+def test_scoring(benchmark, residences, profiles):
+    rng = np.random.default_rng(0)
+    avg = rng.uniform(0.1, 5, residences)
+    incomes = rng.choice([10000, 45000, 125000], profiles)
+    food = rng.integers(1, 6, (profiles, len(FOOD_PREFERENCES)))
+    benchmark(score_matrix, avg, incomes, 42000, food)
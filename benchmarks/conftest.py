@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every on-disk cache of the engine, and where it goes inside the session's scratch directory
+CACHE_PATHS = {
+    "FSQ_CACHE_PATH": "fsq_cache.sqlite",
+    "GEOCODE_CACHE_PATH": "geocode_cache.json",
+    "GEODISCOVERY_CLUSTER_DIR": "clusters",
+    "GEODISCOVERY_GRID_DIR": "grids",
+    "GEODISCOVERY_SHARED_DIR": "shared",
+}
+
+
+def pytest_configure(config):
+    # Runs before any benchmark module imports the engine (which reads these paths at import)
+    # and is inherited by the cold-import subprocesses, so mock data never reaches .cache/
+    config._bench_scratch = tempfile.mkdtemp(prefix="geodiscovery-bench-")
+    for name, entry in CACHE_PATHS.items():
+        os.environ[name] = os.path.join(config._bench_scratch, entry)
+
+
+def pytest_unconfigure(config):
+    scratch = getattr(config, "_bench_scratch", None)
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def mock_api():
+    """Mock Foursquare/Nominatim server wired into the engine, with the response cache off
+    so every benchmark round pays (and counts) its real API calls."""
+    from mock_server import MockServer
+    from geodiscovery import fsq_client, geocoding
+    from geodiscovery.throttle import TokenBucket
+
+    latency = float(os.environ.get("BENCH_LATENCY", 0.005))
+    error_rate = float(os.environ.get("BENCH_ERROR_RATE", 0.0))
+    server = MockServer(latency=latency, error_rate=error_rate, spacing=150.0).start()
+
+    saved = (fsq_client.SEARCH_URL, fsq_client.get_cache, fsq_client.BACKOFF, fsq_client._rate_limiter,
+             geocoding.NOMINATIM_DOMAIN, geocoding.NOMINATIM_SCHEME, geocoding._rate_limiter)
+    fsq_client.SEARCH_URL = server.url + "/v3/places/search"
+    fsq_client.get_cache = lambda: None
+    fsq_client.BACKOFF = 0.001
+    fsq_client._rate_limiter = TokenBucket(0)   # measure the engine, not the QPS cap
+    geocoding.NOMINATIM_DOMAIN, geocoding.NOMINATIM_SCHEME = server.netloc, "http"
+    geocoding._rate_limiter = TokenBucket(0)
+    try:
+        yield server
+    finally:
+        (fsq_client.SEARCH_URL, fsq_client.get_cache, fsq_client.BACKOFF, fsq_client._rate_limiter,
+         geocoding.NOMINATIM_DOMAIN, geocoding.NOMINATIM_SCHEME, geocoding._rate_limiter) = saved
+        server.stop()
+
+
+@pytest.fixture
+def api_calls(mock_api, benchmark):
+    """Resets the server counters and records API calls per benchmarked request."""
+    mock_api.reset_stats()
+    yield mock_api
+    rounds = max(len(benchmark.stats.stats.data), 1) if benchmark.stats else 1
+    for name in ("search", "geocode", "errors"):
+        benchmark.extra_info[f"{name}_calls_per_request"] = mock_api.stats[name] / rounds
+    benchmark.extra_info["bytes_per_request"] = mock_api.stats["bytes"] / rounds
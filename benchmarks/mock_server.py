@@ -0,0 +1,250 @@
+"""Local stand-in for the Foursquare Places and Nominatim APIs.
+
+Serves ``/v3/places/search`` and Nominatim's ``/search`` on localhost with configurable
+latency and error rate, so the recommendation pipeline can be measured without the live
+APIs. Search responses are replayed from recordings when one matches (same normalized key
+as the response cache) and otherwise synthesized deterministically: every category gets a
+fixed, jittered grid of places, so overlapping queries see the same places just like the
+real API.
+
+    python benchmarks/mock_server.py --port 8765 --latency 0.05 --error-rate 0.02
+
+then point the app at it with ``FSQ_BASE_URL=http://127.0.0.1:8765``,
+``NOMINATIM_DOMAIN=127.0.0.1:8765`` and ``NOMINATIM_SCHEME=http``.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import cos, radians, sqrt, ceil, floor
+from urllib.parse import parse_qs, urlencode, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geodiscovery.fsq_cache import make_key  # noqa: E402
+from geodiscovery.geocoding import CITY_COORDINATES  # noqa: E402
+
+M_PER_DEG = 111320.0
+
+
+# ------------------------------
+# Recordings
+# ------------------------------
+def load_recordings(path):
+    """Recorded search responses from a JSONL file of ``{"params": ..., "response": ...}``."""
+    recordings = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[make_key(entry["params"])] = entry["response"]
+    return recordings
+
+
+def recordings_from_cache(db_path):
+    """Recorded search responses straight from a response-cache SQLite file."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return {key: json.loads(zlib.decompress(blob))
+                for key, blob in conn.execute("SELECT key, payload FROM responses")}
+    finally:
+        conn.close()
+
+
+# ------------------------------
+# Synthetic places
+# ------------------------------
+def synthetic_places(lat, lon, radius, category, spacing):
+    """Places of ``category`` within ``radius`` m: one per ``spacing`` m grid cell, jittered."""
+    step = spacing / M_PER_DEG
+    lon_scale = max(cos(radians(lat)), 1e-6)
+    d_lat = radius / M_PER_DEG
+    d_lon = d_lat / lon_scale
+    places = []
+    for i in range(floor((lat - d_lat) / step), ceil((lat + d_lat) / step) + 1):
+        for j in range(floor((lon - d_lon) / step), ceil((lon + d_lon) / step) + 1):
+            rnd = random.Random(f"{category}:{i}:{j}")
+            p_lat, p_lon = (i + rnd.random()) * step, (j + rnd.random()) * step
+            dist = M_PER_DEG * sqrt((p_lat - lat) ** 2 + ((p_lon - lon) * lon_scale) ** 2)
+            if dist <= radius:
+                places.append((dist, {
+                    "fsq_id": f"{category}-{i}-{j}",
+                    "name": f"Place {i}/{j}",
+                    "categories": [{"id": category, "name": category}],
+                    "distance": int(dist),
+                    "geocodes": {"main": {"latitude": p_lat, "longitude": p_lon}},
+                    "location": {"formatted_address": f"{i} Grid Road, Block {j}"},
+                }))
+    return places
+
+
+def synthetic_search(params, spacing):
+    lat, lon = (float(v) for v in params["ll"].split(","))
+    radius = float(params.get("radius", 5000))
+    limit = int(params.get("limit", 10))
+    offset = int(params.get("cursor", 0))
+    places = []
+    for category in params.get("categories", "default").split(","):
+        places.extend(synthetic_places(lat, lon, radius, category, spacing))
+    places.sort(key=lambda p: p[0])
+    page = [p for _, p in places[offset:offset + limit]]
+    next_cursor = offset + limit if offset + limit < len(places) else None
+    return {"results": page}, next_cursor
+
+
+# ------------------------------
+# HTTP server
+# ------------------------------
+class MockServer:
+    """Threaded stand-in server; use as a context manager or call ``start``/``stop``."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 retry_after=0.0, spacing=300.0, recordings=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.spacing = spacing
+        self.recordings = recordings or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def netloc(self):
+        host, port = self.httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"search": 0, "geocode": 0, "errors": 0, "replayed": 0, "bytes": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+            fail = self._random.random() < self.error_rate
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+        return fail
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                server._count("bytes", len(data))
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/v3/places/search":
+                    server._count("search")
+                    if server._delay():
+                        server._count("errors")
+                        status = server._random.choice([429, 500, 503])
+                        return self._send(status, {"message": "mock failure"},
+                                          {"Retry-After": str(server.retry_after)} if status == 429 else None)
+                    recorded = server.recordings.get(make_key(params))
+                    if recorded is not None:
+                        server._count("replayed")
+                        return self._send(200, recorded)
+                    body, next_cursor = synthetic_search(params, server.spacing)
+                    headers = {}
+                    if next_cursor is not None:
+                        next_params = dict(params, cursor=next_cursor)
+                        headers["Link"] = f'<{server.url}{url.path}?{urlencode(next_params)}>; rel="next"'
+                    return self._send(200, body, headers)
+                if url.path == "/search":
+                    server._count("geocode")
+                    server._delay()
+                    query = params.get("q", "")
+                    coords = CITY_COORDINATES.get(query.strip().title())
+                    if coords is None:
+                        rnd = random.Random(query)
+                        coords = (rnd.uniform(8, 32), rnd.uniform(70, 88))
+                    return self._send(200, [{
+                        "place_id": 1, "lat": str(coords[0]), "lon": str(coords[1]), "display_name": query,
+                        "boundingbox": [str(coords[0] - 0.1), str(coords[0] + 0.1),
+                                        str(coords[1] - 0.1), str(coords[1] + 0.1)],
+                    }])
+                if url.path == "/__stats":
+                    return self._send(200, server.stats)
+                return self._send(404, {"message": "not found"})
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the local Foursquare/Nominatim stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of searches failing with 429/5xx")
+    parser.add_argument("--spacing", type=float, default=300.0, help="metres between synthetic places")
+    parser.add_argument("--recordings", help="JSONL recordings file to replay")
+    parser.add_argument("--from-cache", help="response-cache SQLite file to replay")
+    args = parser.parse_args(argv)
+
+    recordings = {}
+    if args.recordings:
+        recordings.update(load_recordings(args.recordings))
+    if args.from_cache:
+        recordings.update(recordings_from_cache(args.from_cache))
+    server = MockServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                        spacing=args.spacing, recordings=recordings)
+    print(f"Serving mock APIs on {server.url} ({len(recordings)} recorded responses)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# GeoDiscovery recommendation engine shared by the Streamlit apps (Final.py, app.py).
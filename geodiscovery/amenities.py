@@ -0,0 +1,286 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from math import cos, radians, sqrt
+
+import numpy as np
+
+from .distance import haversine, EARTH_RADIUS_KM
+from .fsq_client import fetch_many, fetch_all_pages, MAX_WORKERS, NEXT_CURSOR, PAGE_LIMIT
+from .shared import attach
+from .taxonomy import load_taxonomy
+from .tracing import propagate
+
+logger = logging.getLogger(__name__)
+
+NO_AMENITY_DISTANCE = 9999   # km, used when none of the selected amenities is found
+MODES = ("per_residence", "harvest", "grid")
+MIN_TILE_RADIUS = 500        # m; full tiles whose quadrants would be smaller are paged through instead
+M_PER_DEG = 111320.0         # m per degree of latitude
+
+
+# ------------------------------
+# Nearest amenity per residence × category
+# ------------------------------
+def nearest_amenity_distances(points, category_ids, radius=5000, max_workers=MAX_WORKERS):
+    """Distance (km) from every (lat, lon) in ``points`` to the nearest place of each category.
+
+    The whole residence × category matrix is fetched in parallel and the distances are
+    computed in one vectorized call; cells with no result are NaN.
+    """
+    points = np.asarray(list(points), dtype=float).reshape(-1, 2)
+    category_ids = list(category_ids)
+    params_list = [
+        {"ll": f"{lat},{lon}", "radius": radius, "categories": cid, "limit": 1}
+        for lat, lon in points for cid in category_ids
+    ]
+    responses = fetch_many(params_list, max_workers=max_workers)
+
+    amenity = np.full((len(points) * len(category_ids), 2), np.nan)
+    for i, resp in enumerate(responses):
+        r = resp.get("results", [])
+        if r:
+            g = r[0]["geocodes"]["main"]
+            amenity[i] = g["latitude"], g["longitude"]
+    amenity = amenity.reshape(len(points), len(category_ids), 2)
+    return haversine(points[:, None, 0], points[:, None, 1], amenity[..., 0], amenity[..., 1])
+
+
+def _row_averages(matrix):
+    matrix = np.asarray(matrix, dtype=float)
+    found = ~np.isnan(matrix)
+    counts = found.sum(axis=1)
+    totals = np.where(found, matrix, 0).sum(axis=1)
+    return np.where(counts > 0, totals / np.maximum(counts, 1), NO_AMENITY_DISTANCE)
+
+
+def average_distances(points, category_ids, radius=5000, max_workers=MAX_WORKERS,
+                      mode="per_residence", center=None):
+    """Average nearest-amenity distance per residence as an array (``NO_AMENITY_DISTANCE`` where
+    nothing was found).
+
+    ``mode="harvest"`` fetches every selected category once around ``center`` and answers
+    the nearest-amenity queries from a local BallTree instead of one call per residence.
+    ``mode="grid"`` reads them from a prebuilt density grid (see ``density_grid``) with no
+    API call at all, and falls back to harvesting when no grid covers the city and categories,
+    or (for the points off the grid only) when residences lie outside the grid.
+    """
+    points, category_ids = list(points), list(category_ids)
+    if not points:
+        return _row_averages(np.empty((0, len(category_ids))))
+    if center is None:
+        center = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+    return distance_lookup(category_ids, radius, max_workers, mode, center)(points)
+
+
+def distance_lookup(category_ids, radius=5000, max_workers=MAX_WORKERS, mode="per_residence", center=None):
+    """Function mapping a list of (lat, lon) points to their average nearest-amenity distances.
+
+    The one-off work of the harvest and grid modes (the tiled search around ``center``,
+    finding the grid) happens here, so callers scoring points batch by batch pay it once.
+    """
+    category_ids = list(category_ids)
+    if mode == "grid" and category_ids:
+        from .density_grid import find_grid
+
+        grid = find_grid(center[0], center[1], category_ids)
+        if grid is not None:
+            return _grid_lookup(grid, category_ids, radius, max_workers, center)
+        logger.info("No density grid covers %s for these categories; harvesting instead", center)
+        mode = "harvest"
+    if mode == "harvest" and category_ids:
+        places = harvest_places(center[0], center[1], category_ids, radius=radius,
+                                max_workers=max_workers)
+        index = AmenityIndex(places, category_ids)
+        return lambda points: _row_averages(index.nearest_distances(points, max_km=radius / 1000))
+    return lambda points: _row_averages(nearest_amenity_distances(points, category_ids, radius, max_workers))
+
+
+def _grid_lookup(grid, category_ids, radius, max_workers, center):
+    # Points off the grid (e.g. metro-wide residences around a smaller grid) are answered by a
+    # harvest of ``radius`` around ``center``, made the first time such a point shows up
+    fallback = []
+
+    def lookup(points):
+        points = np.asarray(list(points), dtype=float).reshape(-1, 2)
+        averages = _row_averages(grid.nearest_distances(points, category_ids))
+        outside = ~grid.inside(points)
+        if outside.any():
+            if not fallback:
+                logger.info("%d residences lie outside the density grid %s; harvesting for them",
+                            int(outside.sum()), grid.path)
+                fallback.append(distance_lookup(category_ids, radius, max_workers, "harvest", center))
+            averages[outside] = fallback[0](points[outside])
+        return averages
+
+    return lookup
+
+
+def category_matchers(category_ids):
+    """Map each requested category ID to every ID a matching place may carry: the category
+    itself and all of its descendants, in both the hex and the numeric v3 taxonomy."""
+    taxonomy = load_taxonomy()
+    return {cid: taxonomy.descendant_ids(cid) for cid in category_ids}
+
+
+# ------------------------------
+# Category-bulk harvesting
+# ------------------------------
+def harvest_places(lat, lon, category_ids, radius=5000, min_tile_radius=MIN_TILE_RADIUS, max_pages=5,
+                   max_workers=MAX_WORKERS):
+    """All places of the selected categories within ``radius`` m, deduped by fsq_id.
+
+    Every category is harvested on its own with ``discover_places``, so dense categories cannot
+    crowd sparse ones out of a tile's page cap, and full tiles are split rather than truncated.
+    The API cost depends on how dense each category is, not on residences × categories.
+    """
+    category_ids = [str(cid) for cid in category_ids]
+    if not category_ids:
+        return []
+
+    def harvest(cid):
+        return [place for level in discover_places(lat, lon, radius, cid, min_tile_radius, max_pages, max_workers)
+                for place in level]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(category_ids))) as pool:
+        harvests = list(pool.map(propagate(harvest), category_ids))
+
+    places = {}
+    for results in harvests:
+        for place in results:
+            places.setdefault(place.get("fsq_id") or id(place), place)
+    return list(places.values())
+
+
+def _in_radius(results, lat, lon, radius):
+    # Tiles reach past the searched circle at its edge; keep only places inside it
+    if not results:
+        return results
+    coords = [(r["geocodes"]["main"]["latitude"], r["geocodes"]["main"]["longitude"]) for r in results]
+    meters = haversine(lat, lon, *zip(*coords)) * 1000
+    return [r for r, m in zip(results, meters) if m <= radius]
+
+
+def _quadrants(x, y, side, radius):
+    # The four quadrants of a square (center offsets in m) that reach into the ``radius`` circle
+    half = side / 2
+    for cx in (x - half / 2, x + half / 2):
+        for cy in (y - half / 2, y + half / 2):
+            dx, dy = max(abs(cx) - half / 2, 0.0), max(abs(cy) - half / 2, 0.0)
+            if dx * dx + dy * dy <= radius * radius:
+                yield cx, cy, half
+
+
+def discover_places(lat, lon, radius, categories, min_tile_radius=MIN_TILE_RADIUS, max_pages=5,
+                    max_workers=MAX_WORKERS):
+    """Yield every place of ``categories`` (comma-separated IDs) within ``radius`` m, one tile
+    level at a time, as lists of search results.
+
+    The search starts as a single ``radius`` circle. A tile that comes back full
+    (``PAGE_LIMIT`` results, or a next-page cursor) may be hiding more places, so its square
+    is split into the four quadrants of a quadtree over the area's bounding square, each
+    searched with the circle around it. Quadrants never overlap and those outside the circle
+    are never searched, so no area is fetched twice at one level. Every split tile of a level
+    is fetched concurrently, so sparse areas cost one call and only dense ones are refined.
+    Tiles still full below ``min_tile_radius`` are paged through with the cursor instead, for
+    up to ``max_pages`` pages. Tiles overlap at their edges, so callers dedupe by fsq_id.
+    """
+    m_per_deg_lon = M_PER_DEG * cos(radians(lat))
+    tiles = [(0.0, 0.0, 2.0 * radius, radius)]   # x/y offset, square side and search radius (m)
+    while tiles:
+        params_list = [
+            {"ll": f"{lat + y / M_PER_DEG},{lon + x / m_per_deg_lon}", "radius": int(round(r)),
+             "categories": categories, "limit": PAGE_LIMIT}
+            for x, y, _, r in tiles
+        ]
+        level, split, deep = [], [], []
+        for (x, y, side, _), params, resp in zip(tiles, params_list, fetch_many(params_list, max_workers)):
+            results = resp.get("results", [])
+            level.extend(_in_radius(results, lat, lon, radius))
+            if len(results) < PAGE_LIMIT and not resp.get(NEXT_CURSOR):
+                continue
+            if side / 2 / sqrt(2) >= min_tile_radius:
+                split.extend((cx, cy, half, half / sqrt(2)) for cx, cy, half in _quadrants(x, y, side, radius))
+            elif resp.get(NEXT_CURSOR) and max_pages > 1:
+                deep.append(dict(params, cursor=resp[NEXT_CURSOR]))
+        if deep:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(deep))) as pool:
+                for results in pool.map(propagate(lambda p: fetch_all_pages(p, max_pages - 1)), deep):
+                    level.extend(_in_radius(results, lat, lon, radius))
+        if level:
+            yield level
+        tiles = split
+
+
+# ------------------------------
+# Local spatial index (BallTree, haversine metric)
+# ------------------------------
+def _places_key(places, category_ids):
+    ident = sorted((p.get("fsq_id") or "", p["geocodes"]["main"]["latitude"], p["geocodes"]["main"]["longitude"])
+                   for p in places)
+    return hashlib.sha256(json.dumps([list(category_ids), ident]).encode()).hexdigest()[:16]
+
+
+def _category_coords(places, category_ids):
+    # Radian coordinates of the matching places, category after category, with each one's offsets
+    matchers = category_matchers(category_ids)
+    blocks = []
+    for cid in category_ids:
+        coords = []
+        for place in places:
+            ids = set()
+            for c in place.get("categories", []):
+                ids.update(str(c[k]) for k in ("id", "fsq_category_id") if k in c)
+            if ids & matchers[cid]:
+                g = place["geocodes"]["main"]
+                coords.append((g["latitude"], g["longitude"]))
+        blocks.append(np.radians(np.asarray(coords, dtype=float).reshape(-1, 2)))
+    offsets = np.cumsum([0] + [len(b) for b in blocks])
+    return {"coords": np.concatenate(blocks) if blocks else np.empty((0, 2)), "offsets": offsets}
+
+
+class AmenityIndex:
+    """Nearest-amenity queries over harvested places.
+
+    The per-category coordinate arrays are published once per host (see ``shared``), keyed by
+    the harvested places and categories; every worker with the same harvest maps the same
+    files, and the BallTrees are built directly over those mapped arrays.
+    """
+
+    def __init__(self, places, category_ids):
+        from sklearn.neighbors import BallTree
+
+        self.category_ids = list(category_ids)
+        arrays = attach(f"amenities-{_places_key(places, self.category_ids)}",
+                        lambda: _category_coords(places, self.category_ids))
+        coords, offsets = arrays["coords"], arrays["offsets"]
+        self.trees = {}
+        for j, cid in enumerate(self.category_ids):
+            if offsets[j + 1] > offsets[j]:
+                self.trees[cid] = BallTree(coords[offsets[j]:offsets[j + 1]], metric="haversine")
+
+    def nearest_distances(self, points, max_km=None):
+        """Residence × category matrix of nearest distances in km (NaN where nothing in range)."""
+        points = np.radians(np.asarray(list(points), dtype=float).reshape(-1, 2))
+        matrix = np.full((len(points), len(self.category_ids)), np.nan)
+        for j, cid in enumerate(self.category_ids):
+            tree = self.trees.get(cid)
+            if tree is None or not len(points):
+                continue
+            dist, _ = tree.query(points, k=1)
+            matrix[:, j] = dist[:, 0] * EARTH_RADIUS_KM
+        if max_km is not None:
+            matrix[matrix > max_km] = np.nan
+        return matrix
+
+    def counts_within(self, points, radius_km):
+        """Residence × category matrix of place counts within ``radius_km``."""
+        points = np.radians(np.asarray(list(points), dtype=float).reshape(-1, 2))
+        counts = np.zeros((len(points), len(self.category_ids)), dtype=np.int64)
+        for j, cid in enumerate(self.category_ids):
+            tree = self.trees.get(cid)
+            if tree is None or not len(points):
+                continue
+            counts[:, j] = tree.query_radius(points, r=radius_km / EARTH_RADIUS_KM, count_only=True)
+        return counts
@@ -0,0 +1,250 @@
+"""Headless batch recommendations.
+
+Reads user profiles from JSONL or CSV, scores them against every profile's city and streams
+the top-K residences per profile to CSV or Parquet:
+
+    python -m geodiscovery.batch profiles.jsonl -o recommendations.csv --workers 4
+
+A profile has ``id``, ``city``, either ``income`` (₹/month) or ``income_range`` (a label from
+``INCOME_RANGES``), ``category_ids`` (list, or a comma-separated string in CSV) and any of the
+food preference columns (1–5; missing ones default to 3). Cities match ``CITY_COSTS`` case-insensitively.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from . import fsq_client, geocoding
+from .amenities import MODES, average_distances
+from .recommender import (
+    CITY_COSTS, DEFAULT_CITY_COST, DEFAULT_FOOD_PREFERENCE, FOOD_PREFERENCES, INCOME_RANGES,
+    amenity_radius, fetch_metro_residences, fetch_residences, geocode_city,
+)
+from .scoring import Scores
+from .snapshot import REPLAY_ENV
+from .throttle import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = [
+    "profile_id", "city", "rank", "Name", "Address", "Latitude", "Longitude",
+    "Avg Amenity Distance", "Proximity Score", "Affordability Score", "Food Score", "Final Score",
+]
+_INCOME_BY_LABEL = {label: value for ranges in INCOME_RANGES.values() for label, value in ranges.items()}
+_CITY_BY_NAME = {city.casefold(): city for city in CITY_COSTS}
+
+
+# ------------------------------
+# Profile input
+# ------------------------------
+def _missing(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _normalize_city(city):
+    # Geocoding ignores case, so "mumbai" must also find Mumbai's cost and share its worker
+    city = " ".join(str(city or "").split())
+    return _CITY_BY_NAME.get(city.casefold(), city)
+
+
+def _normalize_profile(raw, line_no):
+    profile = dict(raw)
+    profile["id"] = str(profile.get("id", line_no))
+    profile["city"] = _normalize_city(profile.get("city"))
+    if _missing(profile.get("income")):
+        label = profile.get("income_range")
+        if label not in _INCOME_BY_LABEL:
+            raise ValueError(f"profile {profile['id']}: needs 'income' or a known 'income_range'")
+        profile["income"] = _INCOME_BY_LABEL[label]
+    profile["income"] = float(profile["income"])
+
+    cids = profile.get("category_ids") or []
+    if isinstance(cids, str):
+        cids = [c.strip() for c in cids.split(",") if c.strip()]
+    profile["category_ids"] = tuple(cids)
+    # Only a missing preference takes the default; an explicit 0 is kept
+    profile["food"] = [float(DEFAULT_FOOD_PREFERENCE) if _missing(profile.get(f)) else float(profile[f])
+                       for f in FOOD_PREFERENCES]
+    return profile
+
+
+def read_profiles(path):
+    """Yield normalized profiles from a .jsonl/.json-lines or .csv file."""
+    if path.endswith(".csv"):
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for i, raw in enumerate(frame.to_dict("records"), start=1):
+            yield _normalize_profile(raw, i)
+        return
+    with open(path, encoding="utf-8") as fh:
+        for i, line in enumerate(fh, start=1):
+            if line.strip():
+                yield _normalize_profile(json.loads(line), i)
+
+
+# ------------------------------
+# Per-city scoring (runs in a worker process)
+# ------------------------------
+def score_city(city, profiles, top_k=10, mode="per_residence", limit=20, metro_radius=None):
+    """Top-K rows for every profile of one city.
+
+    Residences are fetched once per city and amenity distances once per distinct category
+    set; all profiles sharing a category set are scored together as one matrix.
+    """
+    coords = geocode_city(city)
+    if coords is None:
+        logger.warning("City not found: %s", city)
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    if metro_radius:
+        residences = fetch_metro_residences(coords[0], coords[1], metro_radius)
+    else:
+        residences = fetch_residences(coords[0], coords[1], limit=limit)
+    if residences.empty:
+        logger.warning("No residential areas found in %s", city)
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    cost = CITY_COSTS.get(city)
+    if cost is None:
+        logger.warning("No living cost known for %s; scoring with the default %d", city, DEFAULT_CITY_COST)
+        cost = DEFAULT_CITY_COST
+    points = list(zip(residences["Latitude"], residences["Longitude"]))
+
+    by_categories = defaultdict(list)
+    for profile in profiles:
+        by_categories[profile["category_ids"]].append(profile)
+
+    frames = []
+    for category_ids, group in by_categories.items():
+        avg = average_distances(points, list(category_ids), radius=amenity_radius(mode, metro_radius),
+                                mode=mode, center=coords)
+        scores = Scores(avg, [p["income"] for p in group], cost, [p["food"] for p in group])
+
+        order = scores.top_k(top_k)
+        k = order.shape[1]
+        rows = order.ravel()
+        user = np.repeat(np.arange(len(group)), k)
+        frames.append(pd.DataFrame({
+            "profile_id": [group[u]["id"] for u in user],
+            "city": city,
+            "rank": np.tile(np.arange(1, k + 1), len(group)),
+            "Name": residences["Name"].to_numpy()[rows],
+            "Address": residences["Address"].to_numpy()[rows],
+            "Latitude": residences["Latitude"].to_numpy()[rows],
+            "Longitude": residences["Longitude"].to_numpy()[rows],
+            "Avg Amenity Distance": scores.avg_distances[rows],
+            "Proximity Score": scores.proximity[rows],
+            "Affordability Score": scores.affordability[user],
+            "Food Score": scores.food[user],
+            "Final Score": scores.final[user, rows],
+        }, columns=RESULT_COLUMNS))
+    return pd.concat(frames, ignore_index=True)
+
+
+# ------------------------------
+# Streaming output
+# ------------------------------
+class ResultWriter:
+    """Appends result frames to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._wrote_header = False
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame.astype({"profile_id": str}), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif not self.parquet and not self._wrote_header:
+            pd.DataFrame(columns=RESULT_COLUMNS).to_csv(self.path, index=False)
+
+
+def _init_worker(workers):
+    # Rate limiters are per process, so each worker gets its share of the plan's limits
+    fsq_client._rate_limiter = TokenBucket(fsq_client.QPS / workers,
+                                           fsq_client.BURST / workers if fsq_client.BURST else None)
+    geocoding._rate_limiter = TokenBucket(geocoding._rate_limiter.rate / workers, burst=1)
+
+
+def run_batch(profiles_path, output_path, workers=None, top_k=10, mode="per_residence", limit=20,
+              metro_radius=None):
+    """Score every profile in ``profiles_path``, one worker process per city at a time.
+
+    ``FSQ_QPS`` and the Nominatim rate are split evenly across the workers, so the batch as a
+    whole stays within them.
+    """
+    if metro_radius and mode == "per_residence":
+        raise ValueError("metro-wide scoring needs the harvest or grid amenity mode")
+    by_city = defaultdict(list)
+    for profile in read_profiles(profiles_path):
+        by_city[profile["city"]].append(profile)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(by_city)))
+    writer = ResultWriter(output_path)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+            futures = {
+                pool.submit(score_city, city, profiles, top_k, mode, limit, metro_radius): city
+                for city, profiles in by_city.items()
+            }
+            for future in as_completed(futures):
+                frame = future.result()
+                writer.write(frame)
+                logger.info("%s: %d profiles scored", futures[future], frame["profile_id"].nunique())
+    finally:
+        writer.close()
+    return sum(len(p) for p in by_city.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score many user profiles offline.")
+    parser.add_argument("profiles", help="profiles file (.jsonl or .csv)")
+    parser.add_argument("-o", "--output", default="recommendations.csv", help=".csv or .parquet output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (one city each)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--mode", choices=MODES, default="per_residence", help="amenity lookup mode")
+    parser.add_argument("--limit", type=int, default=20, help="residences fetched per city")
+    parser.add_argument("--metro-radius", type=int, default=None,
+                        help="search the whole metro area within this many metres instead (ignores --limit)")
+    parser.add_argument("--replay", metavar="ARCHIVE",
+                        help="serve every search from a snapshot archive (see geodiscovery.snapshot); no network")
+    args = parser.parse_args(argv)
+
+    if args.metro_radius and args.mode == "per_residence":
+        parser.error("--metro-radius needs --mode harvest or grid (one call per residence would be unbounded)")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.replay:
+        # Worker processes inherit the environment, so they replay too
+        os.environ[REPLAY_ENV] = args.replay
+    count = run_batch(args.profiles, args.output, args.workers, args.top_k, args.mode, args.limit,
+                      args.metro_radius)
+    print(f"Scored {count} profiles -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""KMeans clustering of residences, as explored in GeoDiscovery.ipynb, as a reusable service.
+
+The K sweep (elbow inertia + silhouette) runs in parallel across cores for large datasets,
+switches to MiniBatchKMeans and a sampled silhouette for very large ones, and the fitted
+centroids are persisted so later calls only assign points (O(k) each). ``city_model`` fits
+each city once on a stable sample of its residences; every residence found later is assigned
+to that model instead of triggering a refit.
+"""
+import hashlib
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.environ.get("GEODISCOVERY_CLUSTER_DIR", os.path.join(_ROOT, ".cache", "clusters"))
+MODEL_MAX_AGE = float(os.environ.get("GEODISCOVERY_CLUSTER_MAX_AGE", 30 * 24 * 3600))   # refit/prune after
+
+K_RANGE = range(1, 11)             # the notebook's elbow range; silhouette uses k >= 2
+CITY_SAMPLE = 50                   # residences around a city center its model is fitted on
+PARALLEL_THRESHOLD = 2000          # rows below which the sweep runs in-process (worker start-up dominates)
+MINIBATCH_THRESHOLD = 10000        # rows above which MiniBatchKMeans replaces KMeans
+SILHOUETTE_SAMPLE = 5000           # silhouette_score is O(n²), so score a sample beyond this
+RANDOM_STATE = 42
+
+_models = {}   # in-process memo of loaded/fitted models by key
+
+
+def dataset_hash(X):
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    return hashlib.sha256(str(X.shape).encode() + X.tobytes()).hexdigest()[:16]
+
+
+def _model_key(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+
+# ------------------------------
+# K sweep
+# ------------------------------
+def _fit_k(X, k, random_state=RANDOM_STATE):
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+
+    if len(X) > MINIBATCH_THRESHOLD:
+        model = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3, batch_size=4096)
+    else:
+        model = KMeans(n_clusters=k, random_state=random_state, n_init=10)
+    labels = model.fit_predict(X)
+    silhouette = None
+    if 2 <= k < len(X):
+        sample = SILHOUETTE_SAMPLE if len(X) > SILHOUETTE_SAMPLE else None
+        silhouette = float(silhouette_score(X, labels, sample_size=sample, random_state=random_state))
+    return k, float(model.inertia_), silhouette, model.cluster_centers_
+
+
+def sweep_k(X, k_range=K_RANGE, n_jobs=-1):
+    """Fit every k in parallel; returns ``{k: (inertia, silhouette, centroids)}``."""
+    from joblib import Parallel, delayed
+
+    X = np.asarray(X, dtype=np.float64)
+    ks = [k for k in k_range if k <= len(X)]
+    if len(X) < PARALLEL_THRESHOLD:
+        n_jobs = 1
+    results = Parallel(n_jobs=n_jobs)(delayed(_fit_k)(X, k) for k in ks)
+    return {k: (inertia, silhouette, centroids) for k, inertia, silhouette, centroids in results}
+
+
+# ------------------------------
+# Persisted model
+# ------------------------------
+class ClusterModel:
+    """Chosen K, its centroids, and the sweep curves (inertia / silhouette per k)."""
+
+    def __init__(self, k, centroids, inertia, silhouette, key=None):
+        self.k = k
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.inertia = inertia
+        self.silhouette = silhouette
+        self.key = key
+
+    def assign(self, X):
+        """Nearest-centroid label for each row of ``X``: O(k) per point, no refitting."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.centroids.shape[1])
+        d2 = ((X[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return d2.argmin(axis=1)
+
+
+def fit_clusters(X, k_range=K_RANGE, n_jobs=-1):
+    """Sweep K and keep the best silhouette (as in the notebook); k=1 if too few points."""
+    X = np.asarray(X, dtype=np.float64)
+    sweep = sweep_k(X, k_range, n_jobs)
+    scored = {k: s for k, (_, s, _) in sweep.items() if s is not None}
+    best_k = max(scored, key=scored.get) if scored else min(sweep)
+    return ClusterModel(
+        best_k, sweep[best_k][2],
+        inertia={k: v[0] for k, v in sweep.items()},
+        silhouette=scored,
+        key=dataset_hash(X),
+    )
+
+
+def _prune(keep):
+    # Models nobody has loaded for MODEL_MAX_AGE seconds
+    cutoff = time.time() - MODEL_MAX_AGE
+    for entry in os.listdir(MODEL_DIR):
+        path = os.path.join(MODEL_DIR, entry)
+        try:
+            if entry != keep and entry.endswith(".joblib") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _load_or_fit(key, fit):
+    import joblib
+
+    memo = _models.get(key)
+    if memo is not None and time.time() - memo[0] < MODEL_MAX_AGE:
+        return memo[1]
+    path = os.path.join(MODEL_DIR, f"{key}.joblib")
+    model = None
+    try:
+        fitted = os.path.getmtime(path)
+        if time.time() - fitted < MODEL_MAX_AGE:
+            model = joblib.load(path)
+    except (OSError, EOFError, ValueError):
+        pass
+    if model is None:
+        model, fitted = fit(), time.time()
+        try:
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            joblib.dump(model, path)
+            _prune(os.path.basename(path))
+        except OSError as exc:
+            logger.info("Could not persist cluster model %s: %s", path, exc)
+    _models[key] = (fitted, model)
+    return model
+
+
+def load_or_fit(X, k_range=K_RANGE, n_jobs=-1):
+    """Model for dataset ``X`` and ``k_range`` from ``MODEL_DIR`` if it was fitted before, else fit and save it."""
+    return _load_or_fit(_model_key(dataset_hash(X), tuple(k_range)), lambda: fit_clusters(X, k_range, n_jobs))
+
+
+def city_model(city, load_points, k_range=K_RANGE, n_jobs=-1):
+    """Model for ``city``, fitted once on ``load_points()`` (a stable sample of its residences,
+    e.g. the ``CITY_SAMPLE`` nearest its center) and refitted after ``MODEL_MAX_AGE``.
+
+    The model is keyed by city and ``k_range`` only, so changing result sets reuse it and new
+    residences are just assigned to its centroids. ``load_points`` is only called to fit.
+    """
+    def fit():
+        return fit_clusters(np.unique(np.asarray(load_points(), dtype=np.float64).reshape(-1, 2), axis=0),
+                            k_range, n_jobs)
+
+    return _load_or_fit(_model_key("city", " ".join(str(city).split()).casefold(), tuple(k_range)), fit)
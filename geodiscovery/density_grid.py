@@ -0,0 +1,280 @@
+"""Precomputed per-city amenity density grids.
+
+An offline builder harvests a city's amenities once and stores them on a geohash-aligned grid.
+For every cell and category it keeps the number of places within ``COUNT_RADIUS`` m of the
+cell center and the distance to the nearest one. The notebook's ``Number_of_*`` columns and
+``app.py``'s old 500 m counts were exactly these per-cell counts, computed with live API calls.
+At query time a point maps to its cell by arithmetic alone, so proximity lookups are array
+reads from memory-mapped ``.npy`` files:
+
+    python -m geodiscovery.density_grid Bangalore Delhi --precision 7
+
+Nearest distances are measured from the cell center, so they are approximate within half a
+cell diagonal (about 110 m at precision 7).
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from .amenities import AmenityIndex, harvest_places
+from .distance import haversine
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GRID_DIR = os.environ.get("GEODISCOVERY_GRID_DIR", os.path.join(_ROOT, ".cache", "grids"))
+DEFAULT_PRECISION = 7              # geohash length; cells are ~153 m × 153 m
+COUNT_RADIUS = 500                 # m, as in app.py's commented-out amenity counts
+BUILD_BLOCK_ROWS = 64              # grid rows computed per block while building
+
+# The notebook's amenity columns: restaurants, grocery stores, gyms
+DEFAULT_CATEGORIES = ("4d4b7105d754a06374d81259", "4bf58dd8d48988d118951735", "4bf58dd8d48988d176941735")
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# ------------------------------
+# Geohash cell arithmetic
+# ------------------------------
+def cell_size(precision):
+    """(dlat, dlon) in degrees of one geohash cell at ``precision``."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def geohash(lat, lon, precision=DEFAULT_PRECISION):
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bit, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            ch = ch * 2 + (lon >= mid)
+            lon_lo, lon_hi = (mid, lon_hi) if lon >= mid else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            ch = ch * 2 + (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_BASE32[ch])
+            bit, ch = 0, 0
+    return "".join(chars)
+
+
+def _cell_index(lat, lon, precision):
+    dlat, dlon = cell_size(precision)
+    return (np.floor((np.asarray(lat, dtype=float) + 90) / dlat).astype(np.int64),
+            np.floor((np.asarray(lon, dtype=float) + 180) / dlon).astype(np.int64))
+
+
+def _slug(city):
+    return re.sub(r"[^a-z0-9]+", "-", city.lower()).strip("-")
+
+
+def grid_path(city, precision=DEFAULT_PRECISION, grid_dir=GRID_DIR):
+    return os.path.join(grid_dir, f"{_slug(city)}-p{precision}")
+
+
+# ------------------------------
+# Memory-mapped grid
+# ------------------------------
+class DensityGrid:
+    """Count and nearest distance per (cell, category) for one city, read via ``np.load(mmap_mode="r")``.
+
+    ``counts`` is uint16 and ``nearest`` float32 (km, NaN where nothing is within ``max_km``),
+    both shaped (rows, cols, categories) with the category axis contiguous.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        self.city = self.manifest["city"]
+        self.precision = self.manifest["precision"]
+        self.category_ids = self.manifest["category_ids"]
+        self.max_km = self.manifest["max_km"]
+        self.origin = tuple(self.manifest["origin"])      # global (row, col) of cell [0, 0]
+        self._column = {cid: j for j, cid in enumerate(self.category_ids)}
+        self.counts = np.load(os.path.join(path, "counts.npy"), mmap_mode="r")
+        self.nearest = np.load(os.path.join(path, "nearest.npy"), mmap_mode="r")
+
+    def covers(self, category_ids):
+        return all(str(cid) in self._column for cid in category_ids)
+
+    def contains(self, lat, lon):
+        return bool(self.inside([(lat, lon)])[0])
+
+    def inside(self, points):
+        """Boolean mask of the points that fall on the grid."""
+        rows, _ = self._cells(points)
+        return rows >= 0
+
+    def _cells(self, points):
+        points = np.asarray(list(points), dtype=float).reshape(-1, 2)
+        rows, cols = _cell_index(points[:, 0], points[:, 1], self.precision)
+        rows -= self.origin[0]
+        cols -= self.origin[1]
+        inside = (rows >= 0) & (rows < self.counts.shape[0]) & (cols >= 0) & (cols < self.counts.shape[1])
+        return np.where(inside, rows, -1), np.where(inside, cols, -1)
+
+    def _lookup(self, array, points, category_ids, missing):
+        rows, cols = self._cells(points)
+        columns = [self._column[str(cid)] for cid in category_ids]
+        inside = rows >= 0
+        out = np.full((len(rows), len(columns)), missing, dtype=array.dtype)
+        out[inside] = array[rows[inside], cols[inside]][:, columns]
+        return out
+
+    def nearest_distances(self, points, category_ids):
+        """Point × category matrix of nearest distances in km (NaN where none, or outside the grid)."""
+        return self._lookup(self.nearest, points, category_ids, np.nan).astype(float)
+
+    def amenity_counts(self, points, category_ids):
+        """Point × category matrix of place counts within ``COUNT_RADIUS`` m of each point's cell."""
+        return self._lookup(self.counts, points, category_ids, 0)
+
+
+def load_grid(city, precision=DEFAULT_PRECISION, grid_dir=GRID_DIR):
+    """The built grid for ``city``, or None if it has not been built."""
+    path = grid_path(city, precision, grid_dir)
+    if not os.path.exists(os.path.join(path, "manifest.json")):
+        return None
+    return DensityGrid(path)
+
+
+_grids = {}   # path -> (manifest mtime, DensityGrid)
+
+
+def find_grid(lat, lon, category_ids, grid_dir=GRID_DIR):
+    """Any built grid containing (lat, lon) with every one of ``category_ids``, else None."""
+    try:
+        names = sorted(os.listdir(grid_dir))
+    except OSError:
+        return None
+    for name in names:
+        path = os.path.join(grid_dir, name)
+        try:
+            mtime = os.path.getmtime(os.path.join(path, "manifest.json"))
+        except OSError:
+            continue
+        cached = _grids.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                cached = _grids[path] = (mtime, DensityGrid(path))
+            except (OSError, ValueError, KeyError) as exc:
+                logger.info("Skipping unreadable density grid %s: %s", path, exc)
+                continue
+        grid = cached[1]
+        if grid.covers(category_ids) and grid.contains(lat, lon):
+            return grid
+    return None
+
+
+# ------------------------------
+# Offline builder
+# ------------------------------
+def build_grid(city, center, category_ids=DEFAULT_CATEGORIES, radius=5000, precision=DEFAULT_PRECISION,
+               grid_dir=GRID_DIR):
+    """Harvest ``category_ids`` around ``center`` and write the city's grid.
+
+    The grid is the square of cells spanning ``radius`` m on each side of ``center``. The harvest
+    reaches that square's corners plus ``COUNT_RADIUS``, so every cell's count is complete. A
+    nearest distance is kept only if no unharvested place could be closer. Otherwise it is NaN,
+    like a cell with nothing within ``max_km``.
+
+    The arrays are filled block by block straight into memory-mapped temporary files that
+    replace the old ones only when complete, and the manifest is written last, so readers
+    (including ones still mapping a previous build) never see a half-built grid.
+    """
+    category_ids = [str(cid) for cid in category_ids]
+    lat, lon = center
+    reach = radius * np.sqrt(2) + COUNT_RADIUS
+    places = harvest_places(lat, lon, category_ids, radius=reach)
+    index = AmenityIndex(places, category_ids)
+    logger.info("%s: %d places harvested for %d categories", city, len(places), len(category_ids))
+
+    dlat, dlon = cell_size(precision)
+    span_lat = radius / 111320.0
+    span_lon = radius / (111320.0 * np.cos(np.radians(lat)))
+    (r0, r1), (c0, c1) = _cell_index([lat - span_lat, lat + span_lat], [lon - span_lon, lon + span_lon], precision)
+    n_rows, n_cols = int(r1 - r0 + 1), int(c1 - c0 + 1)
+    col_centers = (np.arange(c0, c1 + 1) + 0.5) * dlon - 180
+
+    path = grid_path(city, precision, grid_dir)
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, "manifest.json")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    shape = (n_rows, n_cols, len(category_ids))
+    suffix = f".{os.getpid()}.tmp"
+    counts_path = os.path.join(path, "counts.npy")
+    nearest_path = os.path.join(path, "nearest.npy")
+    counts = np.lib.format.open_memmap(counts_path + suffix, mode="w+", dtype=np.uint16, shape=shape)
+    nearest = np.lib.format.open_memmap(nearest_path + suffix, mode="w+", dtype=np.float32, shape=shape)
+
+    max_km = radius / 1000
+    for start in range(0, n_rows, BUILD_BLOCK_ROWS):
+        stop = min(start + BUILD_BLOCK_ROWS, n_rows)
+        row_centers = (np.arange(r0 + start, r0 + stop) + 0.5) * dlat - 90
+        block = np.column_stack([np.repeat(row_centers, n_cols), np.tile(col_centers, stop - start)])
+        block_shape = (stop - start, n_cols, len(category_ids))
+        # The harvest is complete within ``reach`` of the center, so it holds each cell's true
+        # nearest place only if that place is within the rest of ``reach`` from the cell
+        known_km = (reach / 1000 - haversine(lat, lon, block[:, 0], block[:, 1]))[:, None]
+        distances = index.nearest_distances(block, max_km=max_km)
+        distances[distances > known_km] = np.nan
+        nearest[start:stop] = distances.reshape(block_shape)
+        counts[start:stop] = np.minimum(
+            index.counts_within(block, COUNT_RADIUS / 1000), np.iinfo(np.uint16).max
+        ).reshape(block_shape)
+    counts.flush()
+    nearest.flush()
+    del counts, nearest
+    os.replace(counts_path + suffix, counts_path)
+    os.replace(nearest_path + suffix, nearest_path)
+
+    manifest = {
+        "city": city, "center": [lat, lon], "radius": radius, "harvest_radius": reach, "precision": precision,
+        "origin": [int(r0), int(c0)], "origin_geohash": geohash((r0 + 0.5) * dlat - 90, (c0 + 0.5) * dlon - 180, precision),
+        "category_ids": category_ids, "count_radius": COUNT_RADIUS, "max_km": max_km,
+        "places": len(places), "built": time.time(),
+    }
+    with open(manifest_path + suffix, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(manifest_path + suffix, manifest_path)
+    return DensityGrid(path)
+
+
+def main(argv=None):
+    from .recommender import SEARCH_RADIUS, geocode_city
+
+    parser = argparse.ArgumentParser(description="Build per-city amenity density grids.")
+    parser.add_argument("cities", nargs="+")
+    parser.add_argument("--categories", default=",".join(DEFAULT_CATEGORIES),
+                        help="comma-separated category IDs (default: restaurants, grocery stores, gyms)")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION, help="geohash length of a cell")
+    parser.add_argument("--radius", type=int, default=SEARCH_RADIUS, help="m around the city center")
+    parser.add_argument("--grid-dir", default=GRID_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    category_ids = [c.strip() for c in args.categories.split(",") if c.strip()]
+    for city in args.cities:
+        coords = geocode_city(city)
+        if coords is None:
+            logger.warning("City not found: %s", city)
+            continue
+        grid = build_grid(city, coords, category_ids, args.radius, args.precision, args.grid_dir)
+        rows, cols, _ = grid.counts.shape
+        print(f"{city}: {rows}×{cols} cells -> {grid.path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+MAX_CHUNK_BYTES = 64 * 1024 * 1024   # memory bound for one block of a distance matrix
+METHODS = ("haversine", "equirectangular")
+
+
+# ------------------------------
+# Utility: Haversine Distance (vectorized)
+# ------------------------------
+def haversine(lat1, lon1, lat2, lon2, dtype=np.float64):
+    """Great-circle distance in km; scalars or any broadcastable arrays of degrees."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=dtype)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def equirectangular(lat1, lon1, lat2, lon2, dtype=np.float64):
+    """Flat-earth approximation in km; well under 0.1% error at city scale and much cheaper."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=dtype)) for v in (lat1, lon1, lat2, lon2))
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS_KM * np.sqrt(x * x + y * y)
+
+
+_KERNELS = {"haversine": haversine, "equirectangular": equirectangular}
+
+
+def _as_coords(points, dtype):
+    return np.asarray(points, dtype=dtype).reshape(-1, 2)
+
+
+def _row_chunks(n_rows, n_cols, dtype, max_bytes):
+    # Each block materializes a few temporaries of rows × cols, so budget for ~4 of them
+    itemsize = np.dtype(dtype).itemsize
+    rows = max(1, int(max_bytes // max(1, 4 * n_cols * itemsize)))
+    for start in range(0, n_rows, rows):
+        yield slice(start, min(start + rows, n_rows))
+
+
+# ------------------------------
+# Pairwise kernels
+# ------------------------------
+def distance_matrix(points_a, points_b, method="haversine", dtype=np.float64, max_bytes=MAX_CHUNK_BYTES):
+    """Full (len(a), len(b)) matrix of distances in km between two arrays of (lat, lon) rows.
+
+    Rows are processed in chunks so the temporaries stay within ``max_bytes``; the result
+    itself is always allocated in full.
+    """
+    kernel = _KERNELS[method]
+    a, b = _as_coords(points_a, dtype), _as_coords(points_b, dtype)
+    out = np.empty((len(a), len(b)), dtype=dtype)
+    for rows in _row_chunks(len(a), len(b), dtype, max_bytes):
+        out[rows] = kernel(a[rows, 0:1], a[rows, 1:2], b[:, 0], b[:, 1], dtype=dtype)
+    return out
+
+
+def nearest(points_a, points_b, method="haversine", dtype=np.float64, max_bytes=MAX_CHUNK_BYTES):
+    """Distance (km) and index of the closest ``points_b`` row for every ``points_a`` row.
+
+    Never holds more than one chunk of the pairwise matrix. With an empty ``points_b`` the
+    distances are ``inf`` and the indices ``-1``.
+    """
+    kernel = _KERNELS[method]
+    a, b = _as_coords(points_a, dtype), _as_coords(points_b, dtype)
+    dist = np.full(len(a), np.inf, dtype=dtype)
+    idx = np.full(len(a), -1, dtype=np.int64)
+    if not len(b):
+        return dist, idx
+    for rows in _row_chunks(len(a), len(b), dtype, max_bytes):
+        block = kernel(a[rows, 0:1], a[rows, 1:2], b[:, 0], b[:, 1], dtype=dtype)
+        idx[rows] = block.argmin(axis=1)
+        dist[rows] = block[np.arange(block.shape[0]), idx[rows]]
+    return dist, idx
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from . import tracing
+
+# ------------------------------
+# Cache Configuration
+# ------------------------------
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.environ.get("FSQ_CACHE_PATH", os.path.join(_ROOT, ".cache", "fsq_cache.sqlite"))
+CACHE_ENABLED = os.environ.get("FSQ_CACHE", "1") != "0"
+COORD_PRECISION = int(os.environ.get("FSQ_CACHE_PRECISION", 4))     # decimals of lat/lon (~11 m)
+TTL_SECONDS = float(os.environ.get("FSQ_CACHE_TTL", 7 * 24 * 3600))
+MAX_ENTRIES = int(os.environ.get("FSQ_CACHE_MAX_ENTRIES", 50000))
+
+
+def make_key(params, precision=COORD_PRECISION):
+    """Normalize search params so equivalent queries share one cache entry."""
+    norm = {}
+    for name, value in params.items():
+        if name == "ll":
+            lat, lon = (float(v) for v in str(value).split(","))
+            value = f"{lat:.{precision}f},{lon:.{precision}f}"
+        elif name == "categories":
+            value = ",".join(sorted(str(value).split(",")))
+        else:
+            value = str(value)
+        norm[name] = value
+    return json.dumps(norm, sort_keys=True)
+
+
+# ------------------------------
+# SQLite response cache with TTL + LRU eviction
+# ------------------------------
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES,
+                 precision=COORD_PRECISION):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+        self.hits = self.misses = self.evictions = self.expired = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, payload BLOB NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        # What users ask for (city × categories × lookup mode), read by the cache warmer
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " city TEXT NOT NULL, categories TEXT NOT NULL, mode TEXT NOT NULL,"
+            " residence_limit INTEGER NOT NULL, metro_radius INTEGER NOT NULL,"
+            " hits INTEGER NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (city, categories, mode, residence_limit, metro_radius))"
+        )
+        self._conn.commit()
+
+    def get(self, params, max_age=None, count=True):
+        """Cached payload for ``params``, or None. With ``max_age`` (s), entries older than that
+        count as misses too, but are kept until a fresh response replaces them. ``count=False``
+        leaves the hit/miss statistics alone, for re-checks of a lookup already counted."""
+        key = make_key(params, self.precision)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expired += 1
+                row = None
+            if row is None or (max_age is not None and now - row[1] > max_age):
+                if count:
+                    self.misses += 1
+                    tracing.record("cache_misses")
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            if count:
+                self.hits += 1
+                tracing.record("cache_hits")
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, params, payload):
+        key = make_key(params, self.precision)
+        blob = zlib.compress(json.dumps(payload).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, now, now),
+            )
+            # LRU: drop everything past the newest ``max_entries`` by last access
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def record_usage(self, city, category_ids, mode, limit=20, metro_radius=None):
+        categories = ",".join(sorted(str(cid) for cid in category_ids))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO usage (city, categories, mode, residence_limit, metro_radius, hits, last_used)"
+                " VALUES (?, ?, ?, ?, ?, 1, ?)"
+                " ON CONFLICT (city, categories, mode, residence_limit, metro_radius)"
+                " DO UPDATE SET hits = hits + 1, last_used = excluded.last_used",
+                (city, categories, mode, int(limit), int(metro_radius or 0), time.time()),
+            )
+            self._conn.commit()
+
+    def popular(self, n=20, window=7 * 24 * 3600):
+        """The ``n`` most requested lookups used within the last ``window`` s, most requested first,
+        as dicts of city, category_ids, mode, limit and metro_radius."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT city, categories, mode, residence_limit, metro_radius FROM usage WHERE last_used >= ?"
+                " ORDER BY hits DESC, last_used DESC LIMIT ?",
+                (time.time() - window, n),
+            ).fetchall()
+        return [{"city": city, "category_ids": categories.split(",") if categories else [], "mode": mode,
+                 "limit": limit, "metro_radius": metro_radius or None}
+                for city, categories, mode, limit, metro_radius in rows]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "entries": len(self),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache instance, or None when disabled with FSQ_CACHE=0."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,211 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs, urlparse
+
+from . import tracing
+from .fsq_cache import get_cache, make_key
+from .throttle import Coalescer, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Foursquare Places Configuration
+# ------------------------------
+FSQ_API_KEY = os.environ.get("FSQ_API_KEY", "fsq3boHgIjG5qvz5vBtpvE8ns4qAo4lrrPFLBf+tlbn+dr8=")
+SEARCH_URL = os.environ.get("FSQ_BASE_URL", "https://api.foursquare.com") + "/v3/places/search"
+HEADERS = {"Accept": "application/json", "Authorization": FSQ_API_KEY}
+
+MAX_WORKERS = int(os.environ.get("FSQ_MAX_WORKERS", 16))   # concurrent requests in a fan-out
+TIMEOUT = float(os.environ.get("FSQ_TIMEOUT", 10))         # seconds per HTTP call
+MAX_RETRIES = int(os.environ.get("FSQ_MAX_RETRIES", 3))
+BACKOFF = 0.5                                               # seconds, doubled on every retry
+MAX_RETRY_AFTER = float(os.environ.get("FSQ_MAX_RETRY_AFTER", 10))   # cap on a server's Retry-After (s)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+QPS = float(os.environ.get("FSQ_QPS", 50))                 # plan limit for the whole process; 0 = off
+BURST = float(os.environ.get("FSQ_BURST", 0)) or None       # tokens saved up; defaults to one second's worth
+PAGE_LIMIT = 50                                             # API maximum for ``limit``
+NEXT_CURSOR = "_next_cursor"                                # pagination cursor stored in payloads
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = TokenBucket(QPS, BURST)   # shared by every session and thread of the process
+_in_flight = Coalescer()
+_background = ContextVar("fsq_background", default=None)   # (max_age, rate limiter) while warming
+
+
+# ------------------------------
+# Shared keep-alive session
+# ------------------------------
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # requests is imported on first use so importing the engine stays cheap
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(HEADERS)
+                _session = session
+    return _session
+
+
+def _backoff_delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = None
+        if delay is not None and delay >= 0:
+            # Never let one 429 hold a request thread for as long as the server likes
+            return min(delay, MAX_RETRY_AFTER)
+    return BACKOFF * (2 ** attempt) + random.uniform(0, BACKOFF)
+
+
+@contextmanager
+def background(max_age, rate_limiter):
+    """Searches in this context (and pool threads started with ``tracing.propagate``) treat
+    cached responses older than ``max_age`` s as stale and refetch them, and also wait on
+    ``rate_limiter``, so background work such as the cache warmer gets a fixed share of QPS."""
+    token = _background.set((max_age, rate_limiter))
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+# ------------------------------
+# Places Search
+# ------------------------------
+def _fetch(params, timeout, retries):
+    # One live search; returns the JSON body, or None when every attempt failed
+    import requests
+
+    session = get_session()
+    for attempt in range(retries + 1):
+        if attempt:
+            tracing.record("retries")
+        bg = _background.get()
+        waited = (bg[1].acquire() if bg else 0.0) + _rate_limiter.acquire()
+        if waited:
+            tracing.record("throttled_s", waited)
+        tracing.record("http_calls")
+        try:
+            resp = session.get(SEARCH_URL, params=params, timeout=timeout)
+        except requests.RequestException as exc:
+            if attempt == retries:
+                logger.warning("Foursquare search failed after %d attempts: %s", attempt + 1, exc)
+                return None
+            time.sleep(_backoff_delay(attempt))
+            continue
+
+        tracing.record("bytes", len(resp.content))
+        if resp.status_code in RETRY_STATUSES and attempt < retries:
+            time.sleep(_backoff_delay(attempt, resp.headers.get("Retry-After")))
+            continue
+        if not resp.ok:
+            logger.warning("Foursquare search returned HTTP %s", resp.status_code)
+            return None
+        try:
+            payload = resp.json()
+        except ValueError:
+            logger.warning("Foursquare search returned non-JSON response (HTTP %s)", resp.status_code)
+            return None
+        # Pagination arrives as a Link header; keep its cursor with the (cacheable) body
+        next_url = resp.links.get("next", {}).get("url")
+        if next_url:
+            cursor = parse_qs(urlparse(next_url).query).get("cursor")
+            if cursor:
+                payload[NEXT_CURSOR] = cursor[0]
+        return payload
+    return None
+
+
+def search_places(params, timeout=TIMEOUT, retries=MAX_RETRIES):
+    """GET /v3/places/search through the response cache, retrying 429/5xx and network
+    errors with exponential backoff.
+
+    Returns the decoded JSON body, or an empty dict when every attempt failed, so callers
+    can keep using ``.get("results", [])`` exactly as before. Failures are never cached.
+    Identical searches already in flight (same cache key, from any session or thread) are
+    not repeated: callers wait for that request and share its body, which they must not modify.
+    In replay mode (``GEODISCOVERY_REPLAY``) the search is answered from the snapshot archive.
+    """
+    from .snapshot import get_replay
+
+    replay = get_replay()
+    if replay is not None:
+        return replay.search(params)
+    cache = get_cache()
+    bg = _background.get()
+    max_age = bg[0] if bg else None
+    if cache is not None:
+        cached = cache.get(params, max_age=max_age)
+        if cached is not None:
+            return cached
+    # Background searches never coalesce with user ones, so users never wait on the warmer's share
+    payload = _in_flight.run((make_key(params), bg is not None),
+                             lambda: _fetch_and_store(params, timeout, retries, cache, max_age))
+    if not payload:
+        # Counted for every caller sharing the failed request, so each one's stage knows
+        tracing.record("failures")
+    return payload
+
+
+def _fetch_and_store(params, timeout, retries, cache, max_age=None):
+    if cache is not None:
+        # Another caller may have fetched and stored this response between our cache miss and
+        # the coalescer; its in-flight request is already over, so look again before refetching
+        cached = cache.get(params, max_age=max_age, count=False)
+        if cached is not None:
+            return cached
+    payload = _fetch(params, timeout, retries)
+    if payload is None:
+        return {}
+    if cache is not None:
+        cache.put(params, payload)
+    return payload
+
+
+def record_usage(city, category_ids, mode, limit=20, metro_radius=None):
+    """Count one user lookup in the usage table read by the cache warmer. It goes through the
+    same cache as the searches, so wherever those are uncached nothing is recorded either."""
+    cache = get_cache()
+    if cache is not None:
+        cache.record_usage(city, category_ids, mode, limit, metro_radius)
+
+
+def fetch_many(params_list, max_workers=MAX_WORKERS):
+    """Run many searches concurrently on the shared session; results keep the input order."""
+    params_list = list(params_list)
+    if not params_list:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(params_list))) as pool:
+        return list(pool.map(tracing.propagate(search_places), params_list))
+
+
+def iter_pages(params, max_pages=5):
+    """Yield each page's results, following the Link-header cursor for up to ``max_pages`` pages."""
+    params = dict(params)
+    for _ in range(max_pages):
+        page = search_places(params)
+        yield page.get("results", [])
+        cursor = page.get(NEXT_CURSOR)
+        if not cursor:
+            break
+        params["cursor"] = cursor
+
+
+def fetch_all_pages(params, max_pages=5):
+    """Follow the Link-header cursor for up to ``max_pages`` pages and return all results."""
+    return [place for results in iter_pages(params, max_pages) for place in results]
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import threading
+
+from . import tracing
+from .throttle import Coalescer, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Bundled coordinates for the supported cities
+# ------------------------------
+CITY_COORDINATES = {
+    "Delhi": (28.6139, 77.2090), "Mumbai": (19.0760, 72.8777), "Bangalore": (12.9716, 77.5946),
+    "Hyderabad": (17.3850, 78.4867), "Ahmedabad": (23.0225, 72.5714), "Chennai": (13.0827, 80.2707),
+    "Kolkata": (22.5726, 88.3639), "Pune": (18.5204, 73.8567), "Jaipur": (26.9124, 75.7873),
+    "Lucknow": (26.8467, 80.9462), "Kanpur": (26.4499, 80.3319), "Nagpur": (21.1458, 79.0882),
+    "Indore": (22.7196, 75.8577), "Thane": (19.2183, 72.9781), "Bhopal": (23.2599, 77.4126),
+    "Visakhapatnam": (17.6868, 83.2185), "Patna": (25.5941, 85.1376), "Vadodara": (22.3072, 73.1812),
+    "Ghaziabad": (28.6692, 77.4538), "Ludhiana": (30.9010, 75.8573)
+}
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEOCODE_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", os.path.join(_ROOT, ".cache", "geocode_cache.json"))
+NOMINATIM_DOMAIN = os.environ.get("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.environ.get("NOMINATIM_SCHEME", "https")
+MIN_INTERVAL = float(os.environ.get("NOMINATIM_MIN_INTERVAL", 1.0))   # Nominatim policy: 1 req/s
+
+_BUNDLED = {name.lower(): coords for name, coords in CITY_COORDINATES.items()}
+_lock = threading.Lock()          # guards the cache dict
+_rate_limiter = TokenBucket(1 / MIN_INTERVAL if MIN_INTERVAL > 0 else 0, burst=1)
+_in_flight = Coalescer()
+_cache = None
+
+
+def _key(city):
+    return " ".join(city.split()).lower()
+
+
+# ------------------------------
+# Persistent cache (lazily populated JSON file)
+# ------------------------------
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(GEOCODE_CACHE_PATH, encoding="utf-8") as fh:
+                _cache = {k: tuple(v) for k, v in json.load(fh).items()}
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _save_cache():
+    tmp = f"{GEOCODE_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(GEOCODE_CACHE_PATH), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(_cache, fh)
+        os.replace(tmp, GEOCODE_CACHE_PATH)
+    except OSError as exc:
+        logger.info("Could not write geocode cache %s: %s", GEOCODE_CACHE_PATH, exc)
+
+
+# ------------------------------
+# Rate-limited Nominatim lookup
+# ------------------------------
+def _nominatim(city):
+    from geopy.geocoders import Nominatim
+
+    geolocator = Nominatim(user_agent="relocation-system", domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+    waited = _rate_limiter.acquire()
+    if waited:
+        tracing.record("throttled_s", waited)
+    tracing.record("http_calls")
+    loc = geolocator.geocode(city)
+    return (loc.latitude, loc.longitude) if loc else None
+
+
+def _lookup(city, key):
+    with _lock:
+        # A lookup for this city may have finished between the caller's cache check and now
+        if key in _load_cache():
+            return _cache[key]
+    coords = _nominatim(city)
+    if coords is not None:
+        with _lock:
+            _cache[key] = coords
+            _save_cache()
+    return coords
+
+
+def geocode(city):
+    """(lat, lon) for ``city``, or None when it cannot be found.
+
+    Supported cities come from the bundled table with no network call. Anything else is
+    looked up once on Nominatim (at most one request per ``MIN_INTERVAL`` across threads)
+    and remembered on disk; concurrent callers asking for the same city share that lookup.
+    In replay mode (``GEODISCOVERY_REPLAY``) only the snapshot's recorded cities are known.
+    """
+    key = _key(city)
+    if not key:
+        return None
+    if key in _BUNDLED:
+        return _BUNDLED[key]
+    from .snapshot import get_replay
+
+    replay = get_replay()
+    if replay is not None:
+        # Offline: only the recorded city centers are known
+        return replay.centers.get(key)
+
+    with _lock:
+        cache = _load_cache()
+        if key in cache:
+            return cache[key]
+    return _in_flight.run(key, lambda: _lookup(city, key))
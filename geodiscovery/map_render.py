@@ -0,0 +1,64 @@
+import html
+import json
+import os
+
+MARKER_THRESHOLD = int(os.environ.get("GEODISCOVERY_MARKER_THRESHOLD", 200))   # rows before clustering
+
+FINAL_COLUMNS = {"name": "Name", "address": "Address", "lat": "Latitude", "lon": "Longitude",
+                 "score": "Final Score"}
+
+# Popup HTML is assembled in the browser, only when a marker is opened; per-user constants
+# (income, city cost) are embedded once in the callback instead of once per row.
+_CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]),
+                          {icon: L.AwesomeMarkers.icon({icon: "home", prefix: "fa", markerColor: "blue"})});
+    marker.bindPopup(function () {
+        return "🏠 <b>" + row[2] + "</b><br>📍 " + row[3] + "<br>" + %s
+            + "✅ Match Score: " + row[4].toFixed(2);
+    }, {maxWidth: 300});
+    return marker;
+}
+"""
+
+
+def build_map(df, income, cost, columns=FINAL_COLUMNS, threshold=MARKER_THRESHOLD, zoom_start=13):
+    """Folium map of the ranked residences.
+
+    Up to ``threshold`` rows get one ``folium.Marker`` with an HTML popup each. Larger result
+    sets are emitted as a single FastMarkerCluster layer built from columnar arrays, with
+    popups created lazily on the client, so page size and render time stay small.
+    """
+    import folium
+
+    lat = df[columns["lat"]].to_numpy(dtype=float)
+    lon = df[columns["lon"]].to_numpy(dtype=float)
+    score = df[columns["score"]].to_numpy(dtype=float)
+    recommendation_map = folium.Map(location=[lat.mean(), lon.mean()], zoom_start=zoom_start)
+
+    if len(df) <= threshold:
+        for name, address, r_lat, r_lon, r_score in zip(df[columns["name"]], df[columns["address"]], lat, lon, score):
+            popup_text = f"""
+        🏠 <b>{name}</b><br>
+        📍 {address}<br>
+        💸 Income: ₹{income:,}<br>
+        📉 City Cost: ₹{int(cost):,}<br>
+        ✅ Match Score: {round(r_score, 2)}
+        """
+            folium.Marker(
+                location=[r_lat, r_lon],
+                popup=folium.Popup(popup_text, max_width=300),
+                icon=folium.Icon(color="blue", icon="home", prefix="fa")
+            ).add_to(recommendation_map)
+        return recommendation_map
+
+    from folium.plugins import FastMarkerCluster
+
+    names = [html.escape(str(v)) for v in df[columns["name"]]]
+    addresses = [html.escape(str(v)) for v in df[columns["address"]]]
+    data = [list(row) for row in zip(lat.round(6).tolist(), lon.round(6).tolist(), names, addresses,
+                                     score.round(4).tolist())]
+    footer = f"💸 Income: ₹{income:,}<br>📉 City Cost: ₹{int(cost):,}<br>"
+    callback = _CLUSTER_CALLBACK % json.dumps(footer)
+    FastMarkerCluster(data, callback=callback).add_to(recommendation_map)
+    return recommendation_map
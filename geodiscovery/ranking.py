@@ -0,0 +1,61 @@
+"""Streaming top-K selection over residences that arrive page by page.
+
+For one user, affordability and food scores are the same for every residence, so the final
+score only grows with proximity, i.e. shrinks with the average amenity distance. Keeping the
+K smallest distances therefore keeps exactly the K best final scores. Proximity is normalized
+by the closest residence overall, and that residence is always among the survivors, so scoring
+the survivors with ``Scores`` reproduces the scores of a full sort.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+
+class TopK:
+    """Bounded max-heap of the ``k`` residences with the smallest average amenity distance.
+
+    Ties keep the residence that arrived first, matching a stable sort of all candidates.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.seen = 0
+        self._heap = []   # (-distance, -arrival, record): the root is the worst survivor
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, distance, record):
+        """Offer one candidate; returns True if it entered the top K."""
+        entry = (-float(distance), -self.seen, record)
+        self.seen += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def snapshot(self, columns=None):
+        """(residences frame, distances array) of the survivors, best first."""
+        entries = sorted(self._heap, key=lambda e: e[:2], reverse=True)
+        frame = pd.DataFrame([e[2] for e in entries], columns=columns)
+        return frame, np.array([-e[0] for e in entries], dtype=float)
+
+
+def stream_top_k(pages, lookup, k, columns=None):
+    """Score each page of residence records with ``lookup`` as it arrives and keep the top ``k``.
+
+    Yields a ``TopK.snapshot()`` whenever a page changes the top K. Memory stays bounded by
+    K plus one page, however many pages are read.
+    """
+    top = TopK(k)
+    for page in pages:
+        distances = lookup([(r["Latitude"], r["Longitude"]) for r in page])
+        changed = False
+        for distance, record in zip(distances, page):
+            changed = top.push(distance, record) or changed
+        if changed:
+            yield top.snapshot(columns)
@@ -0,0 +1,265 @@
+import pandas as pd
+
+from .amenities import MIN_TILE_RADIUS, average_distances, discover_places, distance_lookup
+from .fsq_client import MAX_WORKERS, PAGE_LIMIT, iter_pages, record_usage, search_places
+from .geocoding import geocode
+from .ranking import stream_top_k
+from .scoring import Scores
+from .tracing import stage
+
+# ------------------------------
+# Static Cost Data (Mocked)
+# ------------------------------
+CITY_COSTS = {
+    "Delhi": 40000, "Mumbai": 45000, "Bangalore": 42000, "Hyderabad": 37000,
+    "Ahmedabad": 35000, "Chennai": 39000, "Kolkata": 36000, "Pune": 38000,
+    "Jaipur": 32000, "Lucknow": 31000, "Kanpur": 30000, "Nagpur": 32000,
+    "Indore": 31000, "Thane": 35000, "Bhopal": 30000, "Visakhapatnam": 33000,
+    "Patna": 29000, "Vadodara": 31000, "Ghaziabad": 34000, "Ludhiana": 30000
+}
+DEFAULT_CITY_COST = 30000
+
+INCOME_RANGES = {
+    "Low": {"< ₹15,000": 10000, "₹15,000 - ₹25,000": 20000, "₹25,000 - ₹35,000": 30000},
+    "Medium": {"₹35,000 - ₹50,000": 45000, "₹50,000 - ₹75,000": 65000, "₹75,000 - ₹1,00,000": 90000},
+    "High": {"₹1,00,000 - ₹1,50,000": 125000, "₹1,50,000 - ₹2,00,000": 175000, "> ₹2,00,000": 225000}
+}
+FOOD_PREFERENCES = (
+    "ethnic_food", "fast_food", "veg_preference", "fruit_preference", "organic_food",
+    "home_cooked", "eating_out", "sweet_tooth", "spicy_food"
+)
+DEFAULT_FOOD_PREFERENCE = 3
+
+RESIDENTIAL_CATEGORIES = "4f2a25ac4b909258e854f55f,4e67e38e036454776db1fb3a,4d954b06a243a5684965b473"
+SEARCH_RADIUS = 5000   # metres
+METRO_RADIUS = 15000   # metres covered by a metro-wide search
+RESIDENCE_COLUMNS = ["Name", "Address", "Latitude", "Longitude"]
+
+
+# ------------------------------
+# Pipeline stages
+# ------------------------------
+def geocode_city(city):
+    """(lat, lon) of ``city``, or None when it cannot be found (see ``geocoding.geocode``)."""
+    return geocode(city)
+
+
+def fetch_residences(lat, lon, limit=20, radius=SEARCH_RADIUS):
+    """Residential areas around (lat, lon) as a Name/Address/Latitude/Longitude frame."""
+    results = search_places(_residence_params(lat, lon, radius, limit)).get("results", [])
+    return pd.DataFrame([_residence_record(r) for r in results], columns=RESIDENCE_COLUMNS)
+
+
+def _residence_params(lat, lon, radius, limit):
+    return {
+        "ll": f"{lat},{lon}",
+        "radius": int(radius),
+        "categories": RESIDENTIAL_CATEGORIES,
+        "limit": limit
+    }
+
+
+def _residence_record(r):
+    return {
+        "Name": r.get("name", "N/A"),
+        "Address": r.get("location", {}).get("formatted_address", "N/A"),
+        "Latitude": r["geocodes"]["main"]["latitude"],
+        "Longitude": r["geocodes"]["main"]["longitude"]
+    }
+
+
+def _new_records(results, seen):
+    # Records for places not seen before (by fsq_id); ``seen`` is updated in place
+    records = []
+    for r in results:
+        fsq_id = r.get("fsq_id")
+        if fsq_id is not None:
+            if fsq_id in seen:
+                continue
+            seen.add(fsq_id)
+        records.append(_residence_record(r))
+    return records
+
+
+def discover_residences(lat, lon, metro_radius=METRO_RADIUS, min_tile_radius=MIN_TILE_RADIUS, max_pages=5,
+                        max_workers=MAX_WORKERS):
+    """Yield residential areas across a whole metro area, one tile level at a time, as lists of records.
+
+    The area is covered by ``amenities.discover_places``: one ``metro_radius`` search, whose
+    full tiles are split quadtree-wise, so sparse areas cost one call and only dense ones are
+    refined. Places are deduped by fsq_id and limited to ``metro_radius`` of (lat, lon).
+    """
+    seen = set()
+    for results in discover_places(lat, lon, metro_radius, RESIDENTIAL_CATEGORIES, min_tile_radius, max_pages,
+                                   max_workers):
+        page = _new_records(results, seen)
+        if page:
+            yield page
+
+
+def fetch_metro_residences(lat, lon, metro_radius=METRO_RADIUS):
+    """Every residential area ``discover_residences`` finds, as a Name/Address/Latitude/Longitude frame."""
+    records = [r for page in discover_residences(lat, lon, metro_radius) for r in page]
+    return pd.DataFrame(records, columns=RESIDENCE_COLUMNS)
+
+
+def iter_residences(lat, lon, radius=SEARCH_RADIUS, metro_radius=None, max_pages=5):
+    """Yield residential areas page by page, as lists of Name/Address/Latitude/Longitude records.
+
+    Around (lat, lon) the ``radius`` search is paged through with the Link-header cursor;
+    with ``metro_radius`` (m) the whole metro area is covered by ``discover_residences``.
+    """
+    if metro_radius:
+        yield from discover_residences(lat, lon, metro_radius, max_pages=max_pages)
+        return
+    seen = set()
+    for results in iter_pages(_residence_params(lat, lon, radius, PAGE_LIMIT), max_pages):
+        page = _new_records(results, seen)
+        if page:
+            yield page
+
+
+def amenity_radius(mode, metro_radius=None):
+    """Search radius (m) for amenity lookups: harvest and grid lookups run once around the
+    city center, so they must also reach amenities of residences anywhere in the metro area."""
+    return SEARCH_RADIUS if mode == "per_residence" else SEARCH_RADIUS + (metro_radius or 0)
+
+
+def score_locations(residences, avg_distances, income, cost, food_prefs):
+    """Residences with the proximity, affordability, food and final scores, best first.
+
+    The user's income and food preferences stay scalars; only per-location columns are added.
+    """
+    scores = Scores(avg_distances, [income], cost, [list(food_prefs.values())])
+    df_locations = residences.copy()
+    df_locations["Avg Amenity Distance"] = scores.avg_distances
+    df_locations["Proximity Score"] = scores.proximity
+    df_locations["Affordability Score"] = scores.affordability[0]
+    df_locations["Food Score"] = scores.food[0]
+    df_locations["Final Score"] = scores.final[0]
+    return df_locations.sort_values("Final Score", ascending=False, kind="stable")
+
+
+# ------------------------------
+# Incremental pipeline
+# ------------------------------
+class Pipeline:
+    """geocode(city) → residences(city) → amenity distances(residences, categories) → scores(prefs).
+
+    Every stage remembers the key it was last computed for. A stage's key includes the key
+    of the stage it reads from, so changing an input re-runs that stage and everything
+    downstream of it while upstream results are reused. ``last_run`` records which stages
+    were recomputed on the most recent call. A stage whose searches failed is not reused: its
+    value serves the current call, and the next call recomputes it and everything downstream.
+    Unless ``record_usage`` is off, every distances request is counted in the response cache's
+    usage table, which drives the cache warmer.
+    """
+
+    STAGES = ("geocode", "residences", "distances", "scores")
+
+    def __init__(self, record_usage=True):
+        self._memo = {}
+        self.last_run = {}
+        self.record_usage = record_usage
+
+    def _note_usage(self, city, category_ids, mode, limit=20, metro_radius=None):
+        if self.record_usage:
+            record_usage(city, category_ids, mode, limit, metro_radius)
+
+    def _stage(self, name, key, compute):
+        memo = self._memo.get(name)
+        if memo is not None and memo[0] == key:
+            self.last_run[name] = "cached"
+            return memo[1]
+        with stage(name) as rec:
+            value = compute()
+        self._remember(name, key, value, rec)
+        return value
+
+    def _remember(self, name, key, value, rec):
+        if rec["failures"]:
+            # Stored under a key no later call can match, so this stage and every stage keyed
+            # on it are retried instead of serving an empty or partial result all session
+            key = object()
+        self._memo[name] = (key, value)
+        self.last_run[name] = "failed" if rec["failures"] else "computed"
+
+    def key(self, name):
+        memo = self._memo.get(name)
+        return memo[0] if memo else None
+
+    def geocode(self, city):
+        return self._stage("geocode", (city,), lambda: geocode_city(city))
+
+    def residences(self, city, limit=20):
+        coords = self.geocode(city)
+        if coords is None:
+            return None
+        return self._stage("residences", (self.key("geocode"), limit),
+                           lambda: fetch_residences(coords[0], coords[1], limit=limit))
+
+    def distances(self, city, category_ids, mode="per_residence", limit=20):
+        residences = self.residences(city, limit=limit)
+        if residences is None:
+            return None
+        self._note_usage(city, category_ids, mode, limit)
+        coords = self.geocode(city)
+        key = (self.key("residences"), tuple(category_ids), mode)
+        # The stage value carries the residences it was computed for, so scoring can
+        # always pair distances with the right rows even if a later Submit failed upstream
+        return self._stage("distances", key, lambda: (city, residences, average_distances(
+            zip(residences["Latitude"], residences["Longitude"]), category_ids,
+            radius=SEARCH_RADIUS, mode=mode, center=coords
+        )))[2]
+
+    def stream(self, city, category_ids, mode="per_residence", k=10, metro_radius=None, max_pages=5):
+        """Amenity distances for the top ``k`` of a paginated, optionally metro-wide, residential search.
+
+        Yields (residences, distances) of the current top K after every page that changes it,
+        so callers can show results before the search finishes. The final top K becomes the
+        distances stage, and ``scores`` then re-ranks it like any other result. Metro-wide
+        searches need the ``harvest`` or ``grid`` mode: a per-residence lookup would cost one
+        call per discovered residence and category.
+        """
+        if metro_radius and mode == "per_residence":
+            raise ValueError("metro-wide searches need the harvest or grid amenity mode")
+        coords = self.geocode(city)
+        if coords is None:
+            return
+        self._note_usage(city, category_ids, mode, k, metro_radius)
+        key = (self.key("geocode"), "stream", k, metro_radius, max_pages, tuple(category_ids), mode)
+        memo = self._memo.get("distances")
+        if memo is not None and memo[0] == key:
+            self.last_run["distances"] = "cached"
+            yield memo[1][1], memo[1][2]
+            return
+        result = None
+        with stage("distances") as rec:
+            lookup = distance_lookup(category_ids, radius=amenity_radius(mode, metro_radius), mode=mode,
+                                     center=coords)
+            pages = iter_residences(coords[0], coords[1], metro_radius=metro_radius, max_pages=max_pages)
+            for result in stream_top_k(pages, lookup, k, RESIDENCE_COLUMNS):
+                yield result
+        if result is not None:
+            self._remember("distances", key, (city,) + result, rec)
+
+    @property
+    def city(self):
+        """City of the most recently computed amenity distances."""
+        memo = self._memo.get("distances")
+        return memo[1][0] if memo else None
+
+    def scores(self, income, food_prefs):
+        """Re-score the last fetched residences; never touches the network."""
+        memo = self._memo.get("distances")
+        if memo is None:
+            return None
+        city, residences, avg = memo[1]
+        cost = CITY_COSTS.get(city, DEFAULT_CITY_COST)
+        key = (memo[0], income, tuple(sorted(food_prefs.items())))
+        return self._stage("scores", key, lambda: score_locations(residences, avg, income, cost, food_prefs))
+
+    def run(self, city, category_ids, income, food_prefs, mode="per_residence", limit=20):
+        if self.distances(city, category_ids, mode=mode, limit=limit) is None:
+            return None
+        return self.scores(income, food_prefs)
@@ -0,0 +1,83 @@
+"""Columnar scoring engine.
+
+Per-location data (amenity distances → proximity) and per-user scalars (income → affordability,
+food preferences → food score) are kept apart as compact float32 arrays. The final score for
+U users × N locations is one weighted matrix product:
+
+    final (U, N) = users (U, 3) @ locations (3, N)
+
+with ``users = [w_prox, w_aff * affordability, w_food * food]`` and ``locations = [proximity; 1; 1]``.
+"""
+import numpy as np
+
+DTYPE = np.float32
+WEIGHTS = {"Proximity Score": 0.5, "Affordability Score": 0.3, "Food Score": 0.2}
+MAX_AFFORDABILITY = 1.5
+
+
+# ------------------------------
+# Per-location components
+# ------------------------------
+def proximity_scores(avg_distances):
+    """1 / distance, normalized so the closest location scores 1."""
+    inv = 1 / np.asarray(avg_distances, dtype=DTYPE)
+    return inv / inv.max() if inv.size else inv
+
+
+def location_matrix(proximity):
+    proximity = np.asarray(proximity, dtype=DTYPE)
+    ones = np.ones_like(proximity)
+    return np.stack([proximity, ones, ones])
+
+
+# ------------------------------
+# Per-user components
+# ------------------------------
+def affordability_scores(incomes, cost):
+    return np.minimum(np.asarray(incomes, dtype=DTYPE) / DTYPE(cost), DTYPE(MAX_AFFORDABILITY))
+
+
+def food_scores(food_matrix):
+    """A user's food preferences are the same for every location, so after the per-location
+    max-normalization the food score is 1 for any user with a non-zero preference sum, and 0
+    for one who rated every food preference 0."""
+    totals = np.asarray(food_matrix, dtype=DTYPE).reshape(-1, np.shape(food_matrix)[-1]).sum(axis=1)
+    return np.divide(totals, totals, out=np.zeros_like(totals), where=totals != 0)
+
+
+def user_matrix(affordability, food):
+    affordability = np.asarray(affordability, dtype=DTYPE)
+    return np.column_stack([
+        np.full_like(affordability, WEIGHTS["Proximity Score"]),
+        WEIGHTS["Affordability Score"] * affordability,
+        WEIGHTS["Food Score"] * np.asarray(food, dtype=DTYPE),
+    ]).astype(DTYPE, copy=False)
+
+
+# ------------------------------
+# Scoring
+# ------------------------------
+class Scores:
+    """All score components for one location set against U users."""
+
+    def __init__(self, avg_distances, incomes, cost, food_matrix):
+        self.avg_distances = np.asarray(avg_distances, dtype=DTYPE)
+        self.proximity = proximity_scores(self.avg_distances)
+        self.affordability = affordability_scores(incomes, cost)
+        self.food = food_scores(food_matrix)
+        self.final = user_matrix(self.affordability, self.food) @ location_matrix(self.proximity)
+
+    def top_k(self, k):
+        """(U, k) location indices, best first, for every user."""
+        k = min(k, self.final.shape[1])
+        if k == self.final.shape[1]:
+            part = np.broadcast_to(np.arange(k), self.final.shape)
+        else:
+            part = np.argpartition(-self.final, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(self.final, part, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1)
+
+
+def score_matrix(avg_distances, incomes, cost, food_matrix):
+    """(U, N) float32 final scores for U users against N locations."""
+    return Scores(avg_distances, incomes, cost, food_matrix).final
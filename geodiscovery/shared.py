@@ -0,0 +1,73 @@
+"""Read-only arrays shared by every worker process on a host through memory-mapped files.
+
+The first process that needs a dataset builds it and publishes it as ``.npy`` files under
+``SHARED_DIR/<name>/``. Every process, including that one, then maps those files read-only,
+so the pages live once in the OS page cache and per-worker memory stays flat as workers are
+added. Names carry a fingerprint of their inputs, so changed inputs publish a new directory.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED_DIR = os.environ.get("GEODISCOVERY_SHARED_DIR", os.path.join(_ROOT, ".cache", "shared"))
+SHARED_MAX_AGE = float(os.environ.get("GEODISCOVERY_SHARED_MAX_AGE", 7 * 24 * 3600))   # prune unused sets
+
+_lock = threading.RLock()   # one builder at a time per process; builds may attach other sets
+
+
+def _publish(path, arrays):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(tmp)
+    for key, array in arrays.items():
+        np.save(os.path.join(tmp, f"{key}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another process published the same set first; theirs is identical
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _prune(prefix, keep):
+    # Drop older sets of the same kind nobody has attached to for SHARED_MAX_AGE seconds
+    cutoff = time.time() - SHARED_MAX_AGE
+    for entry in os.listdir(SHARED_DIR):
+        path = os.path.join(SHARED_DIR, entry)
+        if entry != keep and entry.startswith(prefix) and not entry.endswith(".tmp"):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path)
+            except OSError:
+                pass
+
+
+def attach(name, build, mmap_mode="r"):
+    """Arrays published under ``name`` as a dict of memory-mapped arrays, building and publishing
+    them with ``build()`` (a dict of arrays, no object dtypes) if no process has yet. If
+    ``SHARED_DIR`` is not writable the built arrays are used privately instead.
+
+    ``mmap_mode="c"`` maps them copy-on-write for consumers that insist on writable buffers;
+    pages are still shared until written.
+    """
+    with _lock:
+        path = os.path.join(SHARED_DIR, name)
+        try:
+            if not os.path.isdir(path):
+                os.makedirs(SHARED_DIR, exist_ok=True)
+                _publish(path, build())
+                _prune(name.split("-", 1)[0] + "-", name)
+            else:
+                os.utime(path)   # marks the set as in use for _prune
+        except OSError as exc:
+            logger.info("Could not publish shared arrays %s, keeping a private copy: %s", path, exc)
+            return build()
+    return {
+        entry[:-4]: np.load(os.path.join(path, entry), mmap_mode=mmap_mode)
+        for entry in os.listdir(path) if entry.endswith(".npy")
+    }
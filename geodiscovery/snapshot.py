@@ -0,0 +1,212 @@
+"""Offline record/replay of Foursquare search results.
+
+``record`` harvests, for every supported city, the residential areas and the places of every
+category in the taxonomy, and writes them to a versioned, deflate-compressed zip archive.
+Each category is discovered on its own, with full tiles split until they are not, so dense
+categories cannot crowd sparse ones out of a tile's page cap:
+
+    python -m geodiscovery.snapshot -o snapshots/india.zip            # all cities in CITY_COSTS
+    python -m geodiscovery.snapshot -o snapshots/pune.zip Pune
+
+With ``GEODISCOVERY_REPLAY=<archive>`` set (or ``--replay`` on the batch CLI) every
+``/places/search`` is answered from the archive instead of the API, and geocoding uses the
+recorded city centers, so no network call is made. Replay applies the same ``ll``/``radius``/
+``categories``/``limit`` filters as the API (categories match their descendants), orders
+results by distance and pages with a cursor, so runs are deterministic.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+from .amenities import MIN_TILE_RADIUS, discover_places
+from .distance import haversine
+from .fsq_client import NEXT_CURSOR
+
+logger = logging.getLogger(__name__)
+
+REPLAY_ENV = "GEODISCOVERY_REPLAY"                    # names the archive to serve searches from
+FORMAT = "geodiscovery-snapshot"
+VERSION = 1
+MANIFEST = "manifest.json"
+RECORD_RADIUS = 10000                                  # m: residences plus their 5 km amenity reach
+
+_replay = None
+_replay_lock = threading.Lock()
+
+
+def _slug(city):
+    return re.sub(r"[^a-z0-9]+", "-", city.lower()).strip("-")
+
+
+def _category_ids(place):
+    ids = set()
+    for c in place.get("categories", []):
+        ids.update(str(c[k]) for k in ("id", "fsq_category_id") if k in c)
+    return frozenset(ids)
+
+
+# ------------------------------
+# Replay
+# ------------------------------
+class ReplayArchive:
+    """Every recorded place, deduped by fsq_id, with a search that mimics /v3/places/search."""
+
+    def __init__(self, path):
+        self.path = path
+        with zipfile.ZipFile(path) as zf:
+            self.manifest = json.loads(zf.read(MANIFEST))
+            if self.manifest.get("format") != FORMAT or self.manifest.get("version") != VERSION:
+                raise ValueError(f"{path}: not a version {VERSION} {FORMAT} archive")
+            places = {}
+            for city in self.manifest["cities"]:
+                for place in json.loads(zf.read(f"places/{_slug(city)}.json")):
+                    places.setdefault(place.get("fsq_id") or len(places), place)
+        self.places = list(places.values())
+        self.centers = {city.lower(): tuple(info["center"]) for city, info in self.manifest["cities"].items()}
+        coords = np.array([[p["geocodes"]["main"]["latitude"], p["geocodes"]["main"]["longitude"]]
+                           for p in self.places], dtype=float).reshape(-1, 2)
+        self.lat, self.lon = coords[:, 0], coords[:, 1]
+        self.category_ids = [_category_ids(p) for p in self.places]
+        self._matchers = {}
+
+    def _matcher(self, categories):
+        if categories not in self._matchers:
+            from .taxonomy import load_taxonomy
+
+            taxonomy = load_taxonomy()
+            self._matchers[categories] = frozenset().union(
+                *(taxonomy.descendant_ids(cid) for cid in categories.split(",") if cid)
+            )
+        return self._matchers[categories]
+
+    def search(self, params):
+        lat, lon = (float(v) for v in str(params["ll"]).split(","))
+        radius = float(params.get("radius", 1000))
+        limit = int(params.get("limit", 10))
+        offset = int(params.get("cursor") or 0)
+
+        meters = haversine(lat, lon, self.lat, self.lon) * 1000
+        idx = np.flatnonzero(meters <= radius)
+        idx = idx[np.argsort(meters[idx], kind="stable")]
+        if params.get("categories"):
+            wanted = self._matcher(str(params["categories"]))
+            idx = [i for i in idx if self.category_ids[i] & wanted]
+
+        page = idx[offset:offset + limit]
+        payload = {"results": [dict(self.places[i], distance=int(meters[i])) for i in page]}
+        if offset + limit < len(idx):
+            payload[NEXT_CURSOR] = str(offset + limit)
+        return payload
+
+
+def get_replay():
+    """The archive named by ``GEODISCOVERY_REPLAY`` (loaded once per process), or None.
+
+    The variable is read on every call so worker processes started after it is set follow it.
+    """
+    global _replay
+    path = os.environ.get(REPLAY_ENV)
+    if not path:
+        return None
+    if _replay is None or _replay.path != path:
+        with _replay_lock:
+            if _replay is None or _replay.path != path:
+                _replay = ReplayArchive(path)
+                logger.info("Replaying %d recorded places from %s", len(_replay.places), path)
+    return _replay
+
+
+# ------------------------------
+# Recording
+# ------------------------------
+def _slim(place):
+    # Only the fields the engine reads, to keep archives small
+    location = place.get("location", {})
+    return {
+        "fsq_id": place.get("fsq_id"),
+        "name": place.get("name"),
+        "location": {"formatted_address": location.get("formatted_address")} if location else {},
+        "geocodes": {"main": place["geocodes"]["main"]},
+        "categories": [{k: c[k] for k in ("id", "fsq_category_id", "name") if k in c}
+                       for c in place.get("categories", [])],
+    }
+
+
+def taxonomy_category_ids():
+    """Category IDs whose searches (which include descendants) cover every category in the taxonomy:
+    one ID per super category (its numeric v3 ID when it has one, else its hex ID), or its
+    subcategory IDs if it has no row of its own."""
+    from .taxonomy import load_taxonomy
+
+    taxonomy = load_taxonomy()
+    ids = []
+    for sup in taxonomy.super_categories:
+        # Hex and v3 IDs of the same category name the same places; search it once
+        own = sorted(taxonomy.ids_of_label(sup), key=lambda cid: (not cid.isdigit(), cid))
+        ids.extend(own[:1] or taxonomy.category_ids(taxonomy.subcategories([sup])))
+    return ids
+
+
+def record(path, cities=None, radius=RECORD_RADIUS, min_tile_radius=MIN_TILE_RADIUS, max_pages=5):
+    """Record residential areas and every taxonomy category around each city into ``path``.
+
+    The residential categories and every taxonomy category get their own ``discover_places``
+    harvest, so each one is complete down to ``min_tile_radius`` tiles (paged through for up to
+    ``max_pages`` pages) however dense the others are.
+    """
+    from .recommender import CITY_COSTS, RESIDENTIAL_CATEGORIES, geocode_city
+
+    if get_replay() is not None:
+        raise RuntimeError("unset GEODISCOVERY_REPLAY before recording a snapshot")
+    cities = list(cities or CITY_COSTS)
+    searches = [RESIDENTIAL_CATEGORIES] + taxonomy_category_ids()
+
+    manifest = {"format": FORMAT, "version": VERSION, "created": time.time(), "radius": radius,
+                "min_tile_radius": min_tile_radius, "max_pages": max_pages, "cities": {}}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for city in cities:
+            coords = geocode_city(city)
+            if coords is None:
+                logger.warning("City not found: %s", city)
+                continue
+            places = {}
+            for categories in searches:
+                for results in discover_places(coords[0], coords[1], radius, categories, min_tile_radius, max_pages):
+                    for place in results:
+                        places.setdefault(place.get("fsq_id") or id(place), _slim(place))
+            zf.writestr(f"places/{_slug(city)}.json", json.dumps(list(places.values())))
+            manifest["cities"][city] = {"center": list(coords), "places": len(places)}
+            logger.info("%s: %d places recorded", city, len(places))
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=1))
+    os.replace(tmp, path)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a replayable snapshot of Foursquare results.")
+    parser.add_argument("cities", nargs="*", help="cities to record (default: every city in CITY_COSTS)")
+    parser.add_argument("-o", "--output", default="geodiscovery-snapshot.zip", help="archive to write")
+    parser.add_argument("--radius", type=int, default=RECORD_RADIUS, help="m around each city center")
+    parser.add_argument("--min-tile-radius", type=int, default=MIN_TILE_RADIUS,
+                        help="m; full tiles are split down to this size, then paged through")
+    parser.add_argument("--max-pages", type=int, default=5, help="pages per smallest full tile and category")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    manifest = record(args.output, args.cities, args.radius, args.min_tile_radius, args.max_pages)
+    total = sum(info["places"] for info in manifest["cities"].values())
+    print(f"Recorded {total} places for {len(manifest['cities'])} cities -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
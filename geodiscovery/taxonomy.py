@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from .shared import attach
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORY_CSV = os.path.join(_ROOT, "personalization-apis-movement-sdk-categories.csv")
+V3_CATEGORY_CSV = os.path.join(_ROOT, "places-and-apiv3-categories.csv")
+SNAPSHOT_VERSION = 3
+
+
+# ------------------------------
+# Precomputed category taxonomy
+# ------------------------------
+class Taxonomy:
+    """Category lookups the apps need on every rerun, derived once from the two CSVs.
+
+    ``arrays`` holds fixed-width string columns: ``id``/``super``/``sub`` for the hex-ID table
+    with the ``Super Category`` / ``Sub Category`` split the apps always used, and
+    ``all_id``/``all_label`` for every ID of both tables (hex and numeric v3), joined by label.
+    They are normally memory-mapped files shared by all processes on the host.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.super_categories = sorted(set(arrays["super"].tolist()))
+
+    def subcategories(self, supers):
+        a = self.arrays
+        return sorted(set(a["sub"][np.isin(a["super"], list(supers))].tolist()))
+
+    def category_ids(self, subs):
+        # Row order is kept so selections resolve to IDs in the same order as before
+        a = self.arrays
+        ids = []
+        for cid in a["id"][np.isin(a["sub"], list(subs))].tolist():
+            if cid not in ids:
+                ids.append(cid)
+        return ids
+
+    def ids_of_label(self, label):
+        a = self.arrays
+        return set(a["all_id"][a["all_label"] == label].tolist())
+
+    def descendant_ids(self, cid):
+        """The category itself and all its descendants, as hex and numeric v3 IDs."""
+        a = self.arrays
+        labels = a["all_label"][a["all_id"] == str(cid)]
+        if not len(labels):
+            return {str(cid)}
+        label = str(labels[0])
+        mask = (a["all_label"] == label) | np.char.startswith(a["all_label"], label + " > ")
+        return set(a["all_id"][mask].tolist())
+
+
+def _parse_csvs(path, v3_path):
+    import pandas as pd
+
+    full = pd.read_csv(path, dtype=str)
+    frame = full.copy()
+    frame[['Super Category', 'Sub Category']] = frame['Category Label'].str.split(' > ', n=1, expand=True)
+    frame.dropna(subset=['Super Category', 'Sub Category'], inplace=True)
+    v3_frame = pd.read_csv(v3_path, dtype={"Category ID": str})
+    # The label join covers every row, top-level categories (no " > ") included
+    return {
+        "id": frame["Category ID"].to_numpy(dtype=str),
+        "super": frame["Super Category"].to_numpy(dtype=str),
+        "sub": frame["Sub Category"].to_numpy(dtype=str),
+        "all_id": np.concatenate([full["Category ID"].to_numpy(dtype=str), v3_frame["Category ID"].to_numpy(dtype=str)]),
+        "all_label": np.concatenate([full["Category Label"].to_numpy(dtype=str),
+                                     v3_frame["Category Label"].to_numpy(dtype=str)]),
+    }
+
+
+def _fingerprint(*paths):
+    stats = [(os.path.basename(p), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths]
+    return hashlib.sha256(repr((SNAPSHOT_VERSION, stats)).encode()).hexdigest()[:16]
+
+
+# ------------------------------
+# Shared memory-mapped snapshot
+# ------------------------------
+@lru_cache(maxsize=None)
+def load_taxonomy(path=CATEGORY_CSV, v3_path=V3_CATEGORY_CSV):
+    """Taxonomy for this process, loaded once.
+
+    The CSVs are parsed by the first process on the host and published as memory-mapped
+    arrays (see ``shared``); other processes attach to them without parsing or copying.
+    A new set is published whenever either CSV changes (mtime or size) or the format
+    version is bumped.
+    """
+    return Taxonomy(attach(f"taxonomy-{_fingerprint(path, v3_path)}", lambda: _parse_csvs(path, v3_path)))
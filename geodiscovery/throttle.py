@@ -0,0 +1,79 @@
+"""Process-wide request coordination shared by every Streamlit session and worker thread."""
+import threading
+import time
+from concurrent.futures import Future
+
+from . import tracing
+
+
+# ------------------------------
+# Token-bucket rate limiter
+# ------------------------------
+class TokenBucket:
+    """``rate`` tokens per second, up to ``burst`` saved up; a rate of 0 means unlimited.
+
+    Callers reserve their token under the lock and sleep outside it, so waiting threads are
+    served in arrival order and never hold the lock while blocked.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(self.rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take ``tokens``, blocking until they are available; returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# ------------------------------
+# In-flight coalescing
+# ------------------------------
+class Coalescer:
+    """Concurrent calls with the same key share one execution.
+
+    The first caller runs ``fn``; anyone arriving with that key while it runs waits on the
+    same Future and receives its result, or its exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def run(self, key, fn):
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            tracing.record("coalesced")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._in_flight)
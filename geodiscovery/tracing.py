@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("http_calls", "bytes", "cache_hits", "cache_misses", "retries", "coalesced", "throttled_s", "failures")
+METRICS_FILE = os.environ.get("GEODISCOVERY_METRICS_FILE")   # Prometheus textfile-collector target
+
+_current_trace = ContextVar("geodiscovery_trace", default=None)
+_current_stage = ContextVar("geodiscovery_stage", default=None)
+_lock = threading.Lock()
+_totals = {}   # stage -> cumulative counters for the whole process
+
+
+# ------------------------------
+# Stage records
+# ------------------------------
+class StageRecord(dict):
+    """Counters for one stage run: wall time, HTTP calls, bytes received, cache hits/misses, retries,
+    requests that joined an identical in-flight one, seconds spent waiting for the rate limiter,
+    and searches that failed after every retry."""
+
+    def __init__(self, name):
+        super().__init__(stage=name, wall_s=0.0, **{m: 0 for m in METRICS})
+
+
+class Trace:
+    """All stages of one request (e.g. a Submit); use as ``with Trace("submit") as trace:``."""
+
+    def __init__(self, name="submit"):
+        self.name = name
+        self.stages = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        logger.info(self.to_json())
+        if METRICS_FILE:
+            write_prometheus(METRICS_FILE)
+
+    def totals(self):
+        totals = StageRecord("total")
+        for rec in self.stages:
+            for name in ("wall_s",) + METRICS:
+                totals[name] += rec[name]
+        return totals
+
+    def to_json(self):
+        return json.dumps({"trace": self.name, "stages": self.stages, "total": self.totals()})
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage and attribute the HTTP/cache activity inside it to that stage."""
+    rec = StageRecord(name)
+    token = _current_stage.set(rec)
+    start = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["wall_s"] = time.perf_counter() - start
+        _current_stage.reset(token)
+        trace = _current_trace.get()
+        with _lock:
+            if trace is not None:
+                trace.stages.append(rec)
+            totals = _totals.setdefault(name, dict(count=0, wall_s=0.0, **{m: 0 for m in METRICS}))
+            totals["count"] += 1
+            for metric in ("wall_s",) + METRICS:
+                totals[metric] += rec[metric]
+
+
+def record(metric, amount=1):
+    """Add to a counter of the stage running in this context (no-op outside a stage)."""
+    rec = _current_stage.get()
+    if rec is not None:
+        with _lock:
+            rec[metric] += amount
+
+
+def propagate(fn):
+    """Wrap ``fn`` so pool worker threads run it in the caller's trace/stage context."""
+    ctx = copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+# ------------------------------
+# Exporters
+# ------------------------------
+def prometheus_text():
+    """Process-wide cumulative stage metrics in the Prometheus text exposition format."""
+    with _lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+    help_text = {
+        "count": ("geodiscovery_stage_runs_total", "Stage executions"),
+        "wall_s": ("geodiscovery_stage_seconds_total", "Wall time spent in the stage"),
+        "http_calls": ("geodiscovery_stage_http_calls_total", "HTTP requests issued"),
+        "bytes": ("geodiscovery_stage_http_bytes_total", "Response bytes received"),
+        "cache_hits": ("geodiscovery_stage_cache_hits_total", "Response cache hits"),
+        "cache_misses": ("geodiscovery_stage_cache_misses_total", "Response cache misses"),
+        "retries": ("geodiscovery_stage_retries_total", "HTTP retries after 429/5xx or network errors"),
+        "coalesced": ("geodiscovery_stage_coalesced_total", "Requests that shared an identical in-flight request"),
+        "throttled_s": ("geodiscovery_stage_throttled_seconds_total", "Time spent waiting for the rate limiter"),
+        "failures": ("geodiscovery_stage_failed_searches_total", "Searches that failed after every retry"),
+    }
+    lines = []
+    for key, (metric, description) in help_text.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        for name in sorted(totals):
+            lines.append(f'{metric}{{stage="{name}"}} {totals[name][key]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(prometheus_text())
+        os.replace(tmp, path)
+    except OSError as exc:
+        logger.warning("Could not write metrics file %s: %s", path, exc)
@@ -0,0 +1,123 @@
+"""Background cache warming for popular city × category lookups.
+
+Every Submit is counted in the response cache's usage table. The warmer periodically replays the
+most requested lookups through the normal pipeline, so the residential search and every amenity
+search behind them are refetched before their cached responses expire. Its searches wait on a
+dedicated token bucket holding ``WARM_SHARE`` of ``FSQ_QPS``, on top of the shared limiter, so
+warming never takes more than that share of the quota. Run it inside the app
+(``GEODISCOVERY_WARMER=1``) or as its own process:
+
+    python -m geodiscovery.warmer            # loop forever
+    python -m geodiscovery.warmer --once     # one cycle, e.g. from cron
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+
+from .fsq_cache import get_cache
+from .fsq_client import QPS, background
+from .snapshot import get_replay
+from .throttle import TokenBucket
+from .tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+WARMER_ENABLED = os.environ.get("GEODISCOVERY_WARMER", "0") == "1"              # start a thread in the app
+WARM_INTERVAL = float(os.environ.get("GEODISCOVERY_WARM_INTERVAL", 900))         # seconds between cycles
+WARM_TOP_N = int(os.environ.get("GEODISCOVERY_WARM_TOP_N", 20))                  # lookups kept warm
+WARM_WINDOW = float(os.environ.get("GEODISCOVERY_WARM_WINDOW", 7 * 24 * 3600))   # only recently used ones
+WARM_SHARE = float(os.environ.get("GEODISCOVERY_WARM_SHARE", 0.2))               # fraction of FSQ_QPS
+# Responses expiring within this many seconds are refetched; must exceed the interval
+WARM_MARGIN = float(os.environ.get("GEODISCOVERY_WARM_MARGIN", 2 * WARM_INTERVAL))
+
+
+def warm_once(top_n=WARM_TOP_N, window=WARM_WINDOW, margin=WARM_MARGIN, rate_limiter=None):
+    """Refresh the responses behind the ``top_n`` most requested lookups; returns how many were warmed."""
+    from .recommender import Pipeline
+
+    cache = get_cache()
+    if cache is None or get_replay() is not None:
+        return 0
+    rate_limiter = rate_limiter or TokenBucket(QPS * WARM_SHARE, burst=1)
+    warmed = 0
+    with background(max(cache.ttl - margin, 0), rate_limiter), Trace("warm"):
+        for usage in cache.popular(top_n, window):
+            pipeline = Pipeline(record_usage=False)
+            try:
+                if usage["metro_radius"]:
+                    for _ in pipeline.stream(usage["city"], usage["category_ids"], usage["mode"],
+                                             k=usage["limit"], metro_radius=usage["metro_radius"]):
+                        pass
+                else:
+                    pipeline.distances(usage["city"], usage["category_ids"], usage["mode"], limit=usage["limit"])
+            except Exception:
+                logger.exception("Warming %s failed", usage)
+                continue
+            warmed += 1
+    logger.info("Cache warmer refreshed %d popular lookups", warmed)
+    return warmed
+
+
+# ------------------------------
+# Scheduler
+# ------------------------------
+class CacheWarmer(threading.Thread):
+    """Daemon thread running ``warm_once`` every ``interval`` seconds, starting immediately."""
+
+    def __init__(self, interval=WARM_INTERVAL):
+        super().__init__(name="geodiscovery-cache-warmer", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._rate_limiter = TokenBucket(QPS * WARM_SHARE, burst=1)
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                warm_once(rate_limiter=self._rate_limiter)
+            except Exception:
+                logger.exception("Cache warming cycle failed")
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmer():
+    """Start the process-wide warmer thread once; later calls return the running one."""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None or not _warmer.is_alive():
+            _warmer = CacheWarmer()
+            _warmer.start()
+    return _warmer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep popular lookups warm in the response cache.")
+    parser.add_argument("--once", action="store_true", help="run one cycle and exit")
+    parser.add_argument("--interval", type=float, default=WARM_INTERVAL, help="seconds between cycles")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if get_cache() is None:
+        print("The response cache is disabled (FSQ_CACHE=0); nothing to warm.", file=sys.stderr)
+        return
+    if args.once:
+        warm_once()
+        return
+    warmer = CacheWarmer(args.interval)
+    warmer.start()
+    try:
+        warmer.join()
+    except KeyboardInterrupt:
+        warmer.stop()
+
+
+if __name__ == "__main__":
+    main()